@@ -0,0 +1,34 @@
+"""List enrolled people whose faces are near-duplicates of each other.
+
+Run with `python audit_roster.py [--threshold DISTANCE] [--neighbors K]`.
+Every stored sample is matched against the whole gallery in batches (see
+face_system.audit_roster), so this stays fast as the roster grows. Pairs
+under the duplicate threshold are printed closest first; the exit status
+is 1 when any are found.
+"""
+import argparse
+import sys
+
+from face_system import audit_roster, duplicate_threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float,
+                        help="report pairs closer than this distance "
+                             "(default: the duplicate threshold)")
+    parser.add_argument("--neighbors", type=int, default=5,
+                        help="closest people considered per sample")
+    args = parser.parse_args()
+
+    threshold = args.threshold if args.threshold is not None else duplicate_threshold()
+    pairs = audit_roster(threshold, k=args.neighbors)
+    for pair in pairs:
+        (a, b), (account_a, account_b) = pair["people"], pair["accounts"]
+        print(f"{pair['distance']:8.2f}  {a} ({account_a})  <->  {b} ({account_b})")
+    print(f"{len(pairs)} near-duplicate pair(s) under {threshold:g}")
+    sys.exit(1 if pairs else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
+import queue
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog
 from face_system import (
     create_account,
-    login,
-    verify_face,
+    login_async,
+    login_retry_after,
+    verify_face_async,
     lock_door,
     get_full_name,
     update_face,
     add_member,
-    delete_account
+    delete_account,
+    log_auto_locks,
+    prewarm,
+    setup,
+    LOG_RETENTION_DAYS
 )
 from log import SimpleLogger, LogViewerWindow
 
@@ -19,7 +25,11 @@ GREEN = "#2ECC71"
 RED = "#E74C3C"
 
 # ------------------ LOGGER ------------------
-logger = SimpleLogger("visitor_log.csv")
+logger = SimpleLogger("visitor_log.csv", async_writes=True,
+                      retention_days=LOG_RETENTION_DAYS)
+# Lock the door and start the config watcher, metrics and event sinks.
+setup(logger=logger)
+log_auto_locks(logger)
 
 # ------------------ ROOT WINDOW ------------------
 root = tk.Tk()
@@ -39,6 +49,7 @@ content = tk.Frame(card, bg=CARD)
 content.pack()
 
 current_user = None
+scan_task = None
 
 # ------------------ HELPERS ------------------
 def clear():
@@ -74,6 +85,13 @@ def input_box(label, hide=False, placeholder=""):
     e.bind("<FocusOut>", lambda _evt: set_placeholder())
     return e
 
+def confirm_duplicate(matches):
+    people = "\n".join(f"- {m['person']} (account {m['account']})" for m in matches[:3])
+    return messagebox.askyesno(
+        "Possible Duplicate",
+        f"This face looks like someone already enrolled:\n{people}\n\nEnroll anyway?"
+    )
+
 # ------------------ LOGIN / SIGNUP ------------------
 def show_login():
     clear()
@@ -83,10 +101,34 @@ def show_login():
     password = input_box("Password", hide=True)
 
     def do_login():
-        global current_user
         uname = username.get().strip()
         pwd = password.get().strip()
-        if login(uname, pwd):
+        wait = login_retry_after(uname)
+        if wait:
+            messagebox.showerror("Locked Out",
+                f"Too many failed attempts. Try again in {int(wait) + 1} seconds.")
+            logger.log_event(uname if uname else "Unknown", "LOGIN_THROTTLED",
+                             event_type="STRANGER_ALERT")
+            return
+        # Password hashing is deliberately slow; keep it off Tk's thread.
+        login_btn.config(state=tk.DISABLED, text="Checking...")
+        root.after(50, poll_login, login_async(uname, pwd), uname)
+
+    def poll_login(future, uname):
+        global current_user
+        if not future.done():
+            root.after(50, poll_login, future, uname)
+            return
+        if not login_btn.winfo_exists():
+            return      # the user left the login screen meanwhile
+        login_btn.config(state=tk.NORMAL, text="Login")
+        try:
+            ok = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Login failed: {e}")
+            return
+
+        if ok:
             current_user = uname
             logger.log_event(uname, "LOGIN")
             show_dashboard()
@@ -94,10 +136,11 @@ def show_login():
             messagebox.showerror("Denied", "Invalid credentials")
             logger.log_event(uname if uname else "Unknown", "LOGIN_FAILED", event_type="STRANGER_ALERT")
 
-    tk.Button(content, text="Login",
+    login_btn = tk.Button(content, text="Login",
         width=25, height=2,
         bg=BG, fg="black",
-        command=do_login).pack(pady=20)
+        command=do_login)
+    login_btn.pack(pady=20)
 
     tk.Button(content, text="Create Account",
         bg=CARD, fg=BG, bd=0,
@@ -129,7 +172,7 @@ def show_signup():
             messagebox.showerror("Error", "All fields required")
             return
 
-        create_account(uname, pwd, fname, lname)
+        create_account(uname, pwd, fname, lname, confirm_duplicate)
         logger.log_event(uname, "CREATE_ACCOUNT")
         messagebox.showinfo("Success", "Account created!")
         show_login()
@@ -150,13 +193,76 @@ def show_dashboard():
     title.config(text=f"Welcome {full_name}")
 
     # ------------------ ACTIONS ------------------
+    scan_status = tk.Label(content, text="", bg=CARD, fg="black")
+    scan_progress = ttk.Progressbar(content, mode="indeterminate", length=250)
+    scan_events = queue.Queue()
+
     def unlock():
-        if verify_face(current_user):
+        global scan_task
+        if scan_task is not None:
+            return
+        user = current_user
+        # Enrollment shares the camera and retrains the model the scan uses.
+        for button in (unlock_btn, update_btn, add_btn):
+            button.config(state=tk.DISABLED)
+        cancel_btn.pack(after=unlock_btn)
+        scan_status.pack(after=cancel_btn)
+        scan_progress.pack(after=scan_status, pady=5)
+        scan_progress.start(10)
+        scan_status.config(text="Scanning...")
+        # Events arrive on the scan thread; poll_scan picks them up on Tk's.
+        scan_task = verify_face_async(
+            user, lambda event, detail=None: scan_events.put((event, detail))
+        )
+        root.after(50, poll_scan, scan_task, user)
+
+    def poll_scan(task, user):
+        global scan_task
+        messages = {
+            "scanning": "Scanning...",
+            "face_found": "Face found, verifying...",
+            "cancelled": "Scan cancelled",
+        }
+        while not scan_events.empty():
+            event, detail = scan_events.get_nowait()
+            if event == "throttled":
+                task.retry_after = detail["retry_after"]
+            if event in messages and scan_status.winfo_exists():
+                scan_status.config(text=messages[event])
+
+        if not task.done():
+            root.after(50, poll_scan, task, user)
+            return
+
+        scan_task = None
+        if scan_status.winfo_exists():
+            scan_progress.stop()
+            for widget in (cancel_btn, scan_status, scan_progress):
+                widget.pack_forget()
+            for button in (unlock_btn, update_btn, add_btn):
+                button.config(state=tk.NORMAL)
+
+        if task.cancel_event.is_set():
+            return
+        try:
+            granted = task.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Face scan failed: {e}")
+            return
+
+        if granted:
             messagebox.showinfo("Unlocked", "Door unlocked!")
-            logger.log_event(current_user, "UNLOCK")
+            logger.log_event(user, "UNLOCK")
+        elif getattr(task, "retry_after", None):
+            messagebox.showerror("Locked Out",
+                f"Too many failed scans. Try again in {int(task.retry_after) + 1} seconds.")
         else:
             messagebox.showerror("Denied", "Face not recognized")
-            logger.log_event(current_user, "DENIED", event_type="STRANGER_ALERT")
+            logger.log_event(user, "DENIED", event_type="STRANGER_ALERT")
+
+    def cancel_scan():
+        if scan_task is not None:
+            scan_task.cancel()
 
     def lock():
         lock_door()
@@ -164,11 +270,15 @@ def show_dashboard():
         logger.log_event(current_user, "LOCK")
 
     def update():
-        if update_face(current_user):
+        if scan_task is not None:
+            return
+        if update_face(current_user, confirm_duplicate):
             messagebox.showinfo("Updated", "Face updated successfully!")
             logger.log_event(current_user, "UPDATE_FACE")
 
     def add_user():
+        if scan_task is not None:
+            return
         member_name = simpledialog.askstring(
             "Add Member",
             "Enter member name:"
@@ -181,7 +291,7 @@ def show_dashboard():
             messagebox.showerror("Error", "Member name is required")
             return
 
-        if add_member(current_user, member_name):
+        if add_member(current_user, member_name, confirm_duplicate):
             messagebox.showinfo("Success", "Member added successfully")
             logger.log_event(member_name, "ADD_MEMBER")
         else:
@@ -193,6 +303,7 @@ def show_dashboard():
             "Are you sure you want to delete your account?"
         )
         if confirm:
+            cancel_scan()
             if delete_account(current_user):
                 logger.log_event(current_user, "DELETE_ACCOUNT")
                 messagebox.showinfo("Deleted", "Account deleted.")
@@ -203,25 +314,32 @@ def show_dashboard():
         LogViewerWindow(root, logger)
 
     # ------------------ BUTTONS ------------------
-    tk.Button(content, text="Unlock Door",
+    unlock_btn = tk.Button(content, text="Unlock Door",
         width=25, height=2,
         bg=GREEN, fg="black",
-        command=unlock).pack(pady=15)
+        command=unlock)
+    unlock_btn.pack(pady=15)
+
+    cancel_btn = tk.Button(content, text="Cancel Scan",
+        bg=CARD, fg=RED, bd=0,
+        command=cancel_scan)
 
     tk.Button(content, text="Lock Door",
         width=25, height=2,
         bg=GREEN, fg="black",
         command=lock).pack(pady=15)
 
-    tk.Button(content, text="Update Face",
+    update_btn = tk.Button(content, text="Update Face",
         width=25, height=2,
         bg=BG, fg="black",
-        command=update).pack(pady=10)
+        command=update)
+    update_btn.pack(pady=10)
 
-    tk.Button(content, text="Add User",
+    add_btn = tk.Button(content, text="Add User",
         width=25, height=2,
         bg=GREEN, fg="black",
-        command=add_user).pack(pady=15)
+        command=add_user)
+    add_btn.pack(pady=15)
 
     tk.Button(content, text="Delete Account",
         width=25, height=2,
@@ -235,8 +353,10 @@ def show_dashboard():
 
     tk.Button(content, text="Log Out",
         bg=CARD, fg=BG, bd=0,
-        command=lambda: [lock_door(), show_login()]).pack(pady=20)
+        command=lambda: [cancel_scan(), lock_door(), show_login()]).pack(pady=20)
 
 # ------------------ Main-App ------------------
 show_login()
+# Load the model and open the camera once the window is on screen.
+root.after(200, prewarm)
 root.mainloop()
@@ -0,0 +1,276 @@
+"""Detector and recognizer backends selectable by name.
+
+A detector is any object with detect(gray, previous=()) returning
+full-resolution (x, y, w, h) boxes; boxes may be FaceBoxes carrying the
+detector's facial landmarks. A recognizer has the same surface as
+cv2.face.LBPHFaceRecognizer: train(), update(), predict() returning
+(label, distance) with lower meaning closer, write() and read(); it may
+also offer predict_batch(faces, k) for scoring several faces at once.
+Recognizers with aligned_input set take color crops from their align()
+instead of preprocessed gray crops.
+
+The DNN backends run OpenCV's YuNet detector and SFace embedder on the CPU
+from local ONNX files in MODEL_DIR (from the OpenCV model zoo); nothing is
+downloaded at runtime.
+"""
+import os
+
+import cv2
+import numpy as np
+
+from detection import FaceDetector
+from gallery import LBPHGallery
+
+MODEL_DIR = "models"
+YUNET_MODEL = os.path.join(MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+SFACE_MODEL = os.path.join(MODEL_DIR, "face_recognition_sface_2021dec.onnx")
+
+
+def _require(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Model file {path} not found; download it from the OpenCV model "
+            "zoo or choose a different backend"
+        )
+
+
+class FaceBox(tuple):
+    """An (x, y, w, h) box with the detection row it came from.
+
+    landmarks is YuNet's row in full-resolution coordinates: the box, the
+    right and left eye, nose tip and right and left mouth corners, then the
+    score. SFace aligns faces on it.
+    """
+
+    def __new__(cls, box, landmarks):
+        face = super().__new__(cls, box)
+        face.landmarks = landmarks
+        return face
+
+
+class YuNetDetector:
+    """OpenCV DNN face detector (YuNet) run on a downscaled frame."""
+
+    def __init__(self, model_path=YUNET_MODEL, detect_width=320,
+                 score_threshold=0.8, nms_threshold=0.3, top_k=50):
+        _require(model_path)
+        self.detect_width = detect_width
+        self.net = cv2.FaceDetectorYN.create(
+            model_path, "", (detect_width, detect_width),
+            score_threshold, nms_threshold, top_k
+        )
+
+    def detect(self, gray, previous=()):
+        frame_h, frame_w = gray.shape[:2]
+        scale = min(1.0, self.detect_width / float(frame_w))
+        size = (max(1, round(frame_w * scale)), max(1, round(frame_h * scale)))
+        small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+        self.net.setInputSize(size)
+        _, faces = self.net.detect(cv2.cvtColor(small, cv2.COLOR_GRAY2BGR))
+        if faces is None:
+            return []
+
+        boxes = []
+        for face in faces:
+            landmarks = face.astype(np.float32)
+            landmarks[:14] /= scale
+            x, y, w, h = landmarks[:4].round().astype(int)
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(frame_w, x + w), min(frame_h, y + h)
+            if x1 > x0 and y1 > y0:
+                boxes.append(FaceBox((x0, y0, x1 - x0, y1 - y0), landmarks))
+        return boxes
+
+    __call__ = detect
+
+
+class EmbeddingIndex:
+    """Unit-length embeddings in one float32 matrix, searched by cosine.
+
+    Rows are kept sorted by label so the best similarity per label is one
+    reduceat. Once the index holds ivf_min_size rows, an inverted-file
+    index (spherical k-means over the rows) limits each query to the rows
+    of its nprobe closest clusters. New rows join their nearest cluster;
+    the clusters are rebuilt when the index has doubled since the last
+    build.
+    """
+
+    def __init__(self, dim=128, ivf_min_size=5000, nprobe=4):
+        self.ivf_min_size = ivf_min_size
+        self.nprobe = nprobe
+        self.centroids = None
+        self.built_size = 0
+        self._set(np.zeros((0, dim), dtype=np.float32),
+                  np.zeros(0, dtype=np.int32))
+
+    @staticmethod
+    def normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _set(self, vectors, labels):
+        order = np.argsort(labels, kind="stable")
+        self.vectors = np.ascontiguousarray(vectors[order])
+        self.labels = labels[order]
+        self.label_ids, self.label_starts = np.unique(self.labels, return_index=True)
+
+        if len(self.labels) < self.ivf_min_size:
+            self.centroids = None
+        elif self.centroids is None or len(self.labels) >= 2 * self.built_size:
+            self._build_ivf()
+        if self.centroids is not None:
+            assignments = np.argmax(self.vectors @ self.centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=len(self.centroids))
+            self.lists = np.split(order, np.cumsum(counts)[:-1])
+
+    def _build_ivf(self, iterations=10):
+        rng = np.random.default_rng(0)
+        nlist = max(1, int(np.sqrt(len(self.vectors))))
+        centroids = self.vectors[rng.choice(len(self.vectors), nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, self.vectors)
+            empty = np.bincount(assignments, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = self.normalize(sums)
+        self.centroids = centroids
+        self.built_size = len(self.vectors)
+
+    def add(self, vectors, labels):
+        self._set(np.vstack([self.vectors, self.normalize(vectors)]),
+                  np.concatenate([self.labels,
+                                  np.asarray(labels, dtype=np.int32).ravel()]))
+
+    def reset(self, vectors, labels):
+        self.centroids = None
+        self.built_size = 0
+        self._set(self.normalize(vectors), np.asarray(labels, dtype=np.int32).ravel())
+
+    def _top_labels(self, similarities, labels, k):
+        ids, starts = np.unique(labels, return_index=True)
+        best = np.maximum.reduceat(similarities, starts)
+        top = np.argsort(-best)[:k]
+        return [(int(ids[j]), float(best[j])) for j in top]
+
+    def search(self, queries, k=1):
+        """Return, per query, up to k (label, cosine similarity), best first."""
+        queries = self.normalize(queries)
+        if not len(self.labels):
+            return [[] for _ in queries]
+
+        if self.centroids is None:
+            similarities = queries @ self.vectors.T
+            per_label = np.maximum.reduceat(similarities, self.label_starts, axis=1)
+            top = np.argsort(-per_label, axis=1)[:, :k]
+            return [
+                [(int(self.label_ids[j]), float(per_label[i, j])) for j in row]
+                for i, row in enumerate(top)
+            ]
+
+        results = []
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        for query, clusters in zip(queries, probes):
+            # Row order is label order, so sorted rows are label-sorted too.
+            rows = np.sort(np.concatenate([self.lists[c] for c in clusters]))
+            if not len(rows):
+                results.append([])
+                continue
+            results.append(self._top_labels(self.vectors[rows] @ query,
+                                            self.labels[rows], k))
+        return results
+
+
+class SFaceRecognizer:
+    """OpenCV DNN face embedder (SFace) matched through an EmbeddingIndex.
+
+    Distances are 1 - cosine similarity. Enrolling a face only appends its
+    embedding, so update() never retrains anything. Faces should come from
+    align(), which warps the color frame so the YuNet landmarks land where
+    SFace was trained to see them; the published threshold assumes that.
+    """
+
+    INPUT_SIZE = (112, 112)
+    aligned_input = True
+
+    def __init__(self, model_path=SFACE_MODEL, **index_options):
+        _require(model_path)
+        self.net = cv2.FaceRecognizerSF.create(model_path, "")
+        self.index_options = index_options
+        self.index = EmbeddingIndex(**index_options)
+
+    def align(self, frame, landmarks):
+        """112x112 BGR face from a color frame and a YuNet landmarks row."""
+        return self.net.alignCrop(frame, landmarks)
+
+    def embed(self, faces):
+        embeddings = []
+        for face in faces:
+            face = cv2.resize(np.asarray(face), self.INPUT_SIZE)
+            if face.ndim == 2:
+                face = cv2.cvtColor(face, cv2.COLOR_GRAY2BGR)
+            embeddings.append(self.net.feature(face).ravel())
+        return np.array(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+
+    def train(self, faces, labels):
+        self.index.reset(self.embed(faces), labels)
+
+    def update(self, faces, labels):
+        self.index.add(self.embed(faces), labels)
+
+    def predict_batch(self, faces, k=1):
+        if not len(faces):
+            return []
+        return [[(label, 1.0 - similarity) for label, similarity in top]
+                for top in self.index.search(self.embed(faces), k)]
+
+    def predict(self, face):
+        results = self.predict_batch([face], k=1)[0]
+        return results[0] if results else (-1, float("inf"))
+
+    def write(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, vectors=self.index.vectors, labels=self.index.labels)
+
+    def read(self, path):
+        with np.load(path) as data:
+            self.index = EmbeddingIndex(**self.index_options)
+            self.index.reset(data["vectors"], data["labels"])
+
+
+# name -> factory taking a function that loads the Haar cascade, for
+# face_system.DETECTOR_BACKEND; only "haar" calls it.
+DETECTORS = {
+    "haar": lambda load_cascade: FaceDetector(load_cascade()),
+    "yunet": lambda load_cascade: YuNetDetector(),
+}
+
+# name -> (factory, model file, default match threshold on its distance)
+RECOGNIZERS = {
+    "lbph": (cv2.face.LBPHFaceRecognizer_create, "lbph_model.yml", 70),
+    "gallery": (LBPHGallery, "lbph_gallery.npz", 70),
+    # SFace's published cosine threshold is 0.363, for aligned faces.
+    "sface": (SFaceRecognizer, "sface_index.npz", 1.0 - 0.363),
+}
+
+
+def create_detector(name, load_cascade):
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector backend {name!r}; "
+                         f"choose one of {sorted(DETECTORS)}")
+    return DETECTORS[name](load_cascade)
+
+
+def aligned_input(name):
+    """Whether recognizer backend name takes aligned color faces."""
+    return getattr(RECOGNIZERS[name][0], "aligned_input", False)
+
+
+def create_recognizer(name):
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer backend {name!r}; "
+                         f"choose one of {sorted(RECOGNIZERS)}")
+    return RECOGNIZERS[name][0]()
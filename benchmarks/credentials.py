@@ -0,0 +1,58 @@
+"""Time password hashing at several scrypt costs on this machine.
+
+Usage (from the repository root):
+    python -m benchmarks.credentials [--target 0.25] [--rounds 3]
+
+Reports hash and verify latency for the legacy SHA-256 scheme and for
+scrypt at every n from credentials.MIN_N to MAX_N, along with the memory
+each n needs, and the cost calibrate() picks for the target time.
+"""
+import argparse
+import statistics
+import time
+
+import credentials
+
+
+def timed(fn, *args, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(*args)
+        times.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", type=float, default=0.25,
+                        help="calibration target in seconds")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="timings per cost (median is reported)")
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    legacy = credentials.hashlib.sha256(password.encode()).hexdigest()
+    print(f"{'scheme':<24} {'memory':>8} {'hash ms':>9} {'verify ms':>10}")
+    print(f"{'sha256 (legacy)':<24} {'-':>8} {'-':>9} "
+          f"{timed(credentials.verify_password, password, legacy, rounds=args.rounds):10.3f}")
+
+    n = credentials.MIN_N
+    while n <= credentials.MAX_N:
+        cost = {"n": n, "r": 8, "p": 1}
+        hash_ms = timed(credentials.hash_password, password, cost, rounds=args.rounds)
+        hashed = credentials.hash_password(password, cost)
+        verify_ms = timed(credentials.verify_password, password, hashed,
+                          rounds=args.rounds)
+        print(f"{'scrypt n=2^%d r=8 p=1' % (n.bit_length() - 1):<24} "
+              f"{128 * n * 8 // 2 ** 20:>6}MB {hash_ms:9.1f} {verify_ms:10.1f}")
+        n *= 2
+
+    start = time.perf_counter()
+    cost = credentials.calibrate(args.target)
+    print(f"calibrate({args.target}s) -> n=2^{cost['n'].bit_length() - 1} "
+          f"r={cost['r']} p={cost['p']} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare per-frame detection time of FaceDetector against the old settings.
+
+Usage (from the repository root):
+    python -m benchmarks.detection VIDEO_OR_CAMERA_INDEX [--frames N]
+
+The baseline is the original call, detectMultiScale(gray, 1.2, 4) on the
+full-resolution frame. Both run on the same frames; the face counts are
+reported next to the timings so a faster setting that misses faces shows up.
+"""
+import argparse
+import statistics
+import time
+
+import cv2
+
+from detection import FaceDetector
+
+
+def open_source(source):
+    return cv2.VideoCapture(int(source) if source.isdigit() else source)
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000.0, len(result)
+
+
+def summarize(name, times, counts):
+    times = sorted(times)
+    p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+    print(f"{name:<22} mean {statistics.mean(times):7.2f} ms   "
+          f"median {statistics.median(times):7.2f} ms   p95 {p95:7.2f} ms   "
+          f"faces/frame {statistics.mean(counts):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file or camera index")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--detect-width", type=int, default=400)
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier(
+        cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+    )
+    downscaled = FaceDetector(cascade, detect_width=args.detect_width,
+                              roi_refine=False)
+    refined = FaceDetector(cascade, detect_width=args.detect_width)
+
+    cap = open_source(args.source)
+    results = {"baseline (full frame)": ([], []),
+               "downscaled": ([], []),
+               "downscaled + ROI": ([], [])}
+    previous = []
+
+    for _ in range(args.frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        for name, fn, fn_args in (
+            ("baseline (full frame)", cascade.detectMultiScale, (gray, 1.2, 4)),
+            ("downscaled", downscaled.detect, (gray,)),
+        ):
+            ms, count = time_call(fn, *fn_args)
+            results[name][0].append(ms)
+            results[name][1].append(count)
+
+        start = time.perf_counter()
+        previous = refined.detect(gray, previous)
+        results["downscaled + ROI"][0].append((time.perf_counter() - start) * 1000.0)
+        results["downscaled + ROI"][1].append(len(previous))
+
+    cap.release()
+    frame_count = len(results["downscaled"][0])
+    if not frame_count:
+        print("No frames read from", args.source)
+        return
+
+    print(f"{frame_count} frames of {frame.shape[1]}x{frame.shape[0]}")
+    for name, (times, counts) in results.items():
+        summarize(name, times, counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare LBPHGallery against cv2.face.LBPHFaceRecognizer as the gallery grows.
+
+Usage (from the repository root):
+    python -m benchmarks.gallery [--sizes 100,500,1000,2000,5000] [--probes 4]
+
+Synthetic 100x100 faces are used (smoothed noise plus per-sample jitter),
+so the numbers measure matching cost, not accuracy. For each gallery size
+the script reports training time, the time to score a batch of probes one
+at a time with OpenCV, the time to score the same batch in one
+predict_batch() call, and how often the two agree on the top-1 label.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from gallery import LBPHGallery
+
+
+def make_faces(rng, identities, per_identity):
+    faces, labels = [], []
+    for label in range(identities):
+        base = cv2.GaussianBlur(
+            rng.integers(0, 256, (100, 100), dtype=np.uint8), (5, 5), 0
+        ).astype(np.int16)
+        for _ in range(per_identity):
+            jitter = rng.integers(-20, 21, (100, 100), dtype=np.int16)
+            faces.append(np.clip(base + jitter, 0, 255).astype(np.uint8))
+            labels.append(label)
+    return faces, np.array(labels, dtype=np.int32)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000.0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,500,1000,2000,5000",
+                        help="comma-separated gallery sizes (samples)")
+    parser.add_argument("--per-identity", type=int, default=5)
+    parser.add_argument("--probes", type=int, default=4,
+                        help="faces scored per frame")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'gallery':>8} {'train cv2':>10} {'train np':>10} "
+          f"{'predict cv2':>12} {'batch np':>10} {'agree':>6}")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        identities = max(1, size // args.per_identity)
+        faces, labels = make_faces(rng, identities, args.per_identity)
+        probes = [np.clip(faces[i * args.per_identity].astype(np.int16)
+                          + rng.integers(-20, 21, (100, 100), dtype=np.int16),
+                          0, 255).astype(np.uint8)
+                  for i in range(min(args.probes, identities))]
+
+        opencv = cv2.face.LBPHFaceRecognizer_create()
+        gallery = LBPHGallery()
+        train_cv2, _ = timed(opencv.train, faces, labels)
+        train_np, _ = timed(gallery.train, faces, labels)
+
+        predict_cv2, expected = timed(lambda: [opencv.predict(p) for p in probes])
+        predict_np, batch = timed(gallery.predict_batch, probes, 3)
+        agree = sum(e[0] == b[0][0] for e, b in zip(expected, batch))
+
+        print(f"{len(faces):>8} {train_cv2:>8.1f}ms {train_np:>8.1f}ms "
+              f"{predict_cv2:>10.1f}ms {predict_np:>8.1f}ms "
+              f"{agree:>3}/{len(probes)}")
+
+
+if __name__ == "__main__":
+    main()
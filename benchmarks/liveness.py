@@ -0,0 +1,102 @@
+"""Regression-test the liveness check on recorded fixture clips.
+
+Usage (from the repository root):
+    python -m benchmarks.liveness FIXTURE_DIR [--output results.json]
+
+FIXTURE_DIR holds clips sorted by what they show:
+    FIXTURE_DIR/live/<clip.mp4 or folder of frames>
+    FIXTURE_DIR/spoof/<clip.mp4 or folder of frames>
+(spoof clips: printed photos, phone or tablet screens held to the camera).
+
+Each clip's largest face is followed frame by frame and fed to the same
+LivenessCheck verify_face uses. The report lists every clip's verdict,
+frames to verdict, per-frame cost and signal values, and the script exits
+with status 1 if any clip gets the wrong verdict, so it can gate changes
+to liveness.py or its thresholds.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+
+import face_system
+from benchmarks.replay import FrameSource
+from liveness import LivenessCheck
+
+EXPECTED = {"live": True, "spoof": False}
+
+
+def check_clip(path, max_frames):
+    source = FrameSource(path)
+    check = LivenessCheck(face_system.eye_cascade.get())
+    detector = face_system.detector.get()
+    costs = []
+    verdict = None
+
+    for _ in range(max_frames):
+        ret, frame = source.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = detector.detect(gray)
+        if not len(faces):
+            continue
+        x, y, w, h = max(faces, key=lambda box: box[2] * box[3])
+
+        start = time.perf_counter()
+        verdict = check.update(gray[y:y+h, x:x+w])
+        costs.append((time.perf_counter() - start) * 1000.0)
+        if verdict is not None:
+            break
+    source.release()
+
+    return {
+        "verdict": verdict,
+        "frames_to_verdict": check.frames,
+        "ms_per_frame": statistics.mean(costs) if costs else None,
+        "signals": check.signals(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixture_dir")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--max-frames", type=int, default=300,
+                        help="frames to read per clip before giving up")
+    args = parser.parse_args()
+
+    results = []
+    for kind, expected in EXPECTED.items():
+        kind_dir = os.path.join(args.fixture_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for name in sorted(os.listdir(kind_dir)):
+            result = check_clip(os.path.join(kind_dir, name), args.max_frames)
+            result.update(clip=f"{kind}/{name}", expected=expected,
+                          passed=result["verdict"] is expected)
+            results.append(result)
+
+            cost = result["ms_per_frame"]
+            print(f"{'ok  ' if result['passed'] else 'FAIL'} {result['clip']:<40} "
+                  f"verdict {str(result['verdict']):<5} "
+                  f"frames {result['frames_to_verdict']:>3} "
+                  f"{cost if cost is not None else 0.0:6.2f} ms/frame  "
+                  f"blinks {result['signals']['blinks']} "
+                  f"motion {result['signals']['motion']:.2f} "
+                  f"moire {result['signals']['moire']:.1f}")
+
+    failures = [r for r in results if not r["passed"]]
+    print(f"{len(results) - len(failures)}/{len(results)} clips passed")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"clips": results}, f, indent=2)
+    sys.exit(1 if failures or not results else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Replay recorded clips through the recognition pipeline without a camera.
+
+Usage (from the repository root):
+    python -m benchmarks.replay ENROLL_DIR PROBE_DIR [--output results.json]
+
+ENROLL_DIR holds one folder per account with one or more face crops:
+    ENROLL_DIR/<account>/*.jpg
+The crops are preprocessed and saved as the account's face sample cache,
+the same way enrollment does, so the real train_model() is used on a
+temporary DATASET_DIR. For recognizers that take aligned faces, the face
+is found again in each crop to get its landmarks.
+
+PROBE_DIR holds one folder per person seen in the clips, named after their
+account, or "unknown" for people who are not enrolled:
+    PROBE_DIR/<account or unknown>/<clip.mp4 or folder of frames>
+
+Every clip is scored against every enrolled account as the claimed user, so
+each clip gives one genuine attempt (if enrolled) and several impostor
+attempts. Clips run through the same face tracker and sliding-window vote
+as a scan (DETECT_EVERY, REPREDICT_EVERY, VOTE_WINDOW, GRANT_VOTES,
+DENY_VOTES and VERIFY_SCAN_WINDOW); liveness is not replayed, see
+benchmarks/liveness.py for that. The report covers per-stage latency,
+frames per second, time-to-decision and false accept/reject rates over a
+sweep of thresholds.
+
+To A/B-compare parameter sets, run once per config file with
+--config FILE (live settings such as DETECT_SCALE_FACTOR) or with
+FACE_CONFIG=FILE in the environment (any setting, backends included);
+the settings in effect are recorded in the report.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+
+import face_system
+from decision import VoteDecision
+from tracking import FaceTracker
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameSource:
+    """cv2.VideoCapture stand-in for a video file or a directory of frames."""
+
+    def __init__(self, path):
+        self.path = path
+        self.video = None
+        self.frames = []
+        if os.path.isdir(path):
+            self.frames = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        else:
+            self.video = cv2.VideoCapture(path)
+
+    def isOpened(self):
+        return self.video.isOpened() if self.video is not None else bool(self.frames)
+
+    def read(self):
+        if self.video is not None:
+            return self.video.read()
+        if not self.frames:
+            return False, None
+        frame = cv2.imread(self.frames.pop(0))
+        return frame is not None, frame
+
+    def release(self):
+        if self.video is not None:
+            self.video.release()
+        self.frames = []
+
+
+def align_crop(image):
+    """The aligned face in an enrollment crop, or None if none is found."""
+    pad_y, pad_x = image.shape[0] // 2, image.shape[1] // 2
+    padded = cv2.copyMakeBorder(image, pad_y, pad_y, pad_x, pad_x,
+                                cv2.BORDER_REPLICATE)
+    gray = cv2.cvtColor(padded, cv2.COLOR_BGR2GRAY)
+    faces = face_system.detector.get().detect(gray)
+    if not faces:
+        return None
+    box = max(faces, key=lambda b: b[2] * b[3])
+    return face_system.face_input(padded, gray, box, getattr(box, "landmarks", None))
+
+
+def enroll(enroll_dir, dataset_dir):
+    """Lay out ENROLL_DIR as face_system's dataset and train on it."""
+    for account in sorted(os.listdir(enroll_dir)):
+        src_dir = os.path.join(enroll_dir, account)
+        if not os.path.isdir(src_dir):
+            continue
+        images = sorted(name for name in os.listdir(src_dir)
+                        if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not images:
+            continue
+
+        account_dir = os.path.join(dataset_dir, account)
+        os.makedirs(account_dir)
+        samples, aligned = [], []
+        for name in images:
+            image = cv2.imread(os.path.join(src_dir, name))
+            if image is None:
+                continue
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            samples.append(face_system.preprocess_face(gray))
+            if face_system.aligned_input():
+                aligned.append(align_crop(image))
+        if samples:
+            if len(aligned) < len(samples) or any(a is None for a in aligned):
+                aligned = None
+            face_system.save_face_samples(account_dir, samples, aligned)
+
+    face_system.DATASET_DIR = dataset_dir
+    face_system._label_map = None
+    start = time.perf_counter()
+    label_map = face_system.train_model()
+    return label_map, time.perf_counter() - start
+
+
+def replay_clip(path, label_map, stages, max_frames=None):
+    """Run one clip through the face tracker the way a scan does.
+
+    Returns per-frame (elapsed, votes): votes maps each account to its best
+    distance among the predictions made on that frame, or is None on
+    frames that cast no vote (no face, or only cached predictions).
+    """
+    def detect(gray, previous=()):
+        start = time.perf_counter()
+        faces = face_system.detector.get().detect(gray, previous)
+        stages["detectMultiScale"].append(time.perf_counter() - start)
+        return faces
+
+    def predict(faces):
+        start = time.perf_counter()
+        results = face_system.predict_faces(faces)
+        stages["predict"].append(time.perf_counter() - start)
+        return results
+
+    source = FrameSource(path)
+    tracker = FaceTracker(detect, detect_every=face_system.DETECT_EVERY,
+                          repredict_every=face_system.REPREDICT_EVERY)
+    timeline = []
+    elapsed = 0.0
+
+    while max_frames is None or len(timeline) < max_frames:
+        start = time.perf_counter()
+        ret, frame = source.read()
+        decode = time.perf_counter() - start
+        if not ret:
+            break
+
+        t0 = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        t1 = time.perf_counter()
+        tracks = tracker.update(gray)
+        predictions = tracker.predict_all(
+            gray, predict,
+            lambda track: face_system.face_input(frame, gray, track.box,
+                                                 track.landmarks)
+        )
+        t2 = time.perf_counter()
+
+        votes = None
+        for track, (label, distance) in zip(tracks, predictions):
+            if not tracker.is_fresh(track):
+                continue
+            if votes is None:
+                votes = {}
+            account = label_map.get(label)
+            if account is not None and distance < votes.get(account, float("inf")):
+                votes[account] = distance
+
+        stages["decode"].append(decode)
+        stages["cvtColor"].append(t1 - t0)
+        stages["track"].append(t2 - t1)
+        elapsed += decode + (t2 - t0)
+        timeline.append((elapsed, votes))
+
+    source.release()
+    return timeline
+
+
+def decide(timeline, account, threshold, scan_window):
+    """Replay run_verification's vote for the claimed account.
+
+    Returns the elapsed time at which access was granted, or None if the
+    vote denied it or scan_window ran out first.
+    """
+    votes = VoteDecision(face_system.VOTE_WINDOW, face_system.GRANT_VOTES,
+                         face_system.DENY_VOTES)
+    for elapsed, frame_votes in timeline:
+        if frame_votes is not None:
+            if votes.vote(frame_votes.get(account, float("inf")) < threshold) == "granted":
+                return elapsed
+        if votes.decision == "denied" or elapsed >= scan_window:
+            return None
+    return None
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000.0,
+        "p50_ms": pick(0.50) * 1000.0,
+        "p95_ms": pick(0.95) * 1000.0,
+        "p99_ms": pick(0.99) * 1000.0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(enroll_dir, probe_dir, thresholds, max_frames=None):
+    dataset_dir = tempfile.mkdtemp(prefix="replay_faces_")
+    try:
+        label_map, train_time = enroll(enroll_dir, dataset_dir)
+        if not label_map:
+            raise SystemExit(f"No enrollment images found in {enroll_dir}")
+        accounts = sorted(set(label_map.values()))
+
+        stages = {"decode": [], "cvtColor": [], "track": [],
+                  "detectMultiScale": [], "predict": []}
+        clips = []
+        for person in sorted(os.listdir(probe_dir)):
+            person_dir = os.path.join(probe_dir, person)
+            if not os.path.isdir(person_dir):
+                continue
+            for clip in sorted(os.listdir(person_dir)):
+                path = os.path.join(person_dir, clip)
+                timeline = replay_clip(path, label_map, stages, max_frames)
+                clips.append((person, os.path.relpath(path, probe_dir), timeline))
+    finally:
+        shutil.rmtree(dataset_dir, ignore_errors=True)
+
+    frames = sum(len(timeline) for _, _, timeline in clips)
+    total_time = sum(timeline[-1][0] for _, _, timeline in clips if timeline)
+
+    sweep = []
+    for threshold in thresholds:
+        genuine = rejected = impostor = accepted = 0
+        decision_times = []
+        for person, _, timeline in clips:
+            for account in accounts:
+                matched_at = decide(timeline, account, threshold,
+                                    face_system.VERIFY_SCAN_WINDOW)
+                if account == person:
+                    genuine += 1
+                    if matched_at is None:
+                        rejected += 1
+                    else:
+                        decision_times.append(matched_at)
+                else:
+                    impostor += 1
+                    if matched_at is not None:
+                        accepted += 1
+        sweep.append({
+            "threshold": threshold,
+            "genuine_attempts": genuine,
+            "impostor_attempts": impostor,
+            "false_reject_rate": rejected / genuine if genuine else None,
+            "false_accept_rate": accepted / impostor if impostor else None,
+            "median_time_to_decision_s":
+                statistics.median(decision_times) if decision_times else None,
+        })
+
+    return {
+        "commit": git_commit(),
+        "settings": {name: face_system.settings.current(name)
+                     for name in sorted(face_system.settings.defaults)},
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "enrolled_accounts": len(accounts),
+        "enrolled_people": len(label_map),
+        "train_time_s": train_time,
+        "clips": len(clips),
+        "frames": frames,
+        "fps": frames / total_time if total_time else None,
+        "stages": {name: percentiles(samples) for name, samples in stages.items()},
+        "thresholds": sweep,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("enroll_dir")
+    parser.add_argument("probe_dir")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--max-frames", type=int,
+                        help="only replay this many frames of each clip")
+    parser.add_argument("--config",
+                        help="apply this config file's live settings first")
+    parser.add_argument("--thresholds",
+                        help="comma-separated confidence thresholds to sweep "
+                             "(default: 60%%-140%% of the backend's threshold)")
+    args = parser.parse_args()
+
+    if args.config:
+        face_system.settings.path = args.config
+        face_system.settings.reload()
+
+    if args.thresholds:
+        thresholds = [float(t) for t in args.thresholds.split(",")]
+    else:
+        base = face_system.match_threshold()
+        thresholds = [round(base * f, 4) for f in (0.6, 0.7, 0.8, 0.9, 1.0,
+                                                   1.1, 1.2, 1.4)]
+    report = run(args.enroll_dir, args.probe_dir, thresholds, args.max_frames)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Serve several entrances from one box: one camera and one lock per door.
+
+Run with `python cameras.py` after listing the entrances in ENTRANCES.
+Each camera has its own capture thread; frames from all of them go to a
+shared process pool that runs detection and recognition, so throughput
+grows with the number of cores. Every camera may have at most
+MAX_PENDING frames in the pool at once: a busy camera skips frames rather
+than queueing them (the grabber always hands out the newest one), and no
+camera can take the pool slots of the others.
+
+As with the single-door scan, an account whose votes grant access also
+has to pass a liveness check (see liveness.py) on its matching face
+before the door unlocks; a failed check is treated as a spoof.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+
+import face_system
+from capture import ManagedCamera
+from decision import VoteDecision
+from face_system import add_door, lock_door, unlock_door
+from liveness import LivenessCheck
+from log import SimpleLogger
+from metrics import metrics
+
+MAX_PENDING = 2          # frames per camera in the pool at once
+
+
+class Entrance:
+    """One door: its camera source, lock pin and decision state."""
+
+    def __init__(self, name, source, lock_pin):
+        self.name = name
+        self.source = source
+        self.lock_pin = lock_pin
+        self.camera = ManagedCamera(source)
+        self.slots = threading.BoundedSemaphore(MAX_PENDING)
+        self.lock = threading.Lock()
+        self.scan_start = None
+        self.votes = {}         # account -> VoteDecision for the current scan
+        self.liveness = {}      # account -> LivenessCheck, from its first match
+
+    def reset(self):
+        self.scan_start = None
+        self.votes = {}
+        self.liveness = {}
+
+
+# name, camera source (device index, video file or URL), lock GPIO pin
+ENTRANCES = [
+    Entrance(face_system.DEFAULT_DOOR, 0, face_system.LOCK_PIN),
+]
+
+
+_model_stamp = None
+
+
+def _init_worker(dataset_dir, detector_backend, recognizer_backend,
+                 metrics_enabled):
+    face_system.DATASET_DIR = dataset_dir
+    face_system.DETECTOR_BACKEND = detector_backend
+    face_system.RECOGNIZER_BACKEND = recognizer_backend
+    metrics.enabled = metrics_enabled
+
+
+def recognize_frame(image, stamp):
+    """Pool job: return ([(box, account name or None, distance)], timings).
+
+    image is the gray frame, or the color one for recognizers that take
+    aligned color faces. stamp identifies the model on disk; the worker
+    reloads its copy when the main process has saved a newer one. timings
+    is the worker's metrics.drain() report (detect and predict stages and
+    their counters), for the parent to merge into its own metrics.
+    """
+    global _model_stamp
+    # A failed read (the model is mid-write, say) keeps the previous model
+    # and is retried on the next frame.
+    if stamp != _model_stamp and face_system.load_model():
+        _model_stamp = stamp
+
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    boxes = face_system.detect_faces(gray)
+    label_map = face_system._label_map
+    if not label_map or not len(boxes):
+        return ([(tuple(int(v) for v in box), None, float("inf")) for box in boxes],
+                metrics.drain())
+
+    predictions = face_system.predict_faces(
+        [face_system.face_input(image, gray, box, getattr(box, "landmarks", None))
+         for box in boxes]
+    )
+    return [
+        (tuple(int(v) for v in box), label_map.get(label), float(distance))
+        for box, (label, distance) in zip(boxes, predictions)
+    ], metrics.drain()
+
+
+def model_stamp():
+    manifest = os.path.join(face_system.DATASET_DIR, face_system.MODEL_MANIFEST)
+    try:
+        return os.stat(manifest).st_mtime_ns
+    except OSError:
+        return None
+
+
+class CameraManager:
+    """Runs every entrance's camera against one shared recognition pool.
+
+    on_event(entrance, event, detail) is called with "granted" (detail is
+    the account), "denied" (detail is "liveness" when a matching face
+    failed liveness), "auto_lock" or "error"; it runs on capture or pool
+    threads and must not block.
+    """
+
+    def __init__(self, entrances, workers=None, on_event=None):
+        self.entrances = entrances
+        self.workers = workers or os.cpu_count() or 1
+        self.notify = on_event or (lambda entrance, event, detail=None: None)
+        self.pool = None
+        self.threads = []
+        self.running = False
+
+    def start(self):
+        # Make sure the model on disk is current before workers load it.
+        face_system.ensure_model()
+        # Spawned, not forked: the parent already runs camera threads.
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(face_system.DATASET_DIR, face_system.DETECTOR_BACKEND,
+                      face_system.RECOGNIZER_BACKEND, metrics.enabled),
+        )
+        self.running = True
+        face_system.locks.subscribe(self._lock_changed)
+        for entrance in self.entrances:
+            add_door(entrance.name, entrance.lock_pin)
+            thread = threading.Thread(target=self._capture, args=(entrance,),
+                                      name=f"camera-{entrance.name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        face_system.locks.unsubscribe(self._lock_changed)
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.threads = []
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        for entrance in self.entrances:
+            entrance.camera.release()
+            lock_door(entrance.name)
+
+    def _capture(self, entrance):
+        watcher = f"camera-{entrance.name}"
+        with face_system.locks.watching(watcher, entrance.name):
+            while self.running:
+                face_system.locks.heartbeat(watcher)
+                # Backpressure: wait for one of this camera's frames to finish.
+                if not entrance.slots.acquire(timeout=0.2):
+                    continue
+
+                ret, frame = entrance.camera.read()
+                if not ret:
+                    entrance.slots.release()
+                    time.sleep(0.5)
+                    continue
+
+                metrics.mark_frame()
+                if face_system.aligned_input():
+                    image = frame
+                else:
+                    image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                submitted = time.perf_counter()
+                try:
+                    future = self.pool.submit(recognize_frame, image, model_stamp())
+                except (RuntimeError, BrokenProcessPool) as e:
+                    entrance.slots.release()
+                    self.notify(entrance, "error", str(e))
+                    time.sleep(1.0)
+                    continue
+                future.add_done_callback(
+                    lambda f, frame=frame: self._finish(entrance, f, submitted, frame)
+                )
+
+    def _finish(self, entrance, future, submitted, frame):
+        entrance.slots.release()
+        metrics.observe("pool_roundtrip", time.perf_counter() - submitted)
+        if future.cancelled():
+            return
+        try:
+            results, timings = future.result()
+        except Exception as e:
+            self.notify(entrance, "error", str(e))
+            return
+        metrics.merge(timings)
+        self._decide(entrance, results, frame)
+
+    def _vote(self, entrance, results, threshold):
+        """Feed one frame's matches to the entrance's votes (locked)."""
+        matched = {name for _, name, distance in results
+                   if name is not None and distance < threshold}
+        for account in matched | set(entrance.votes):
+            votes = entrance.votes.setdefault(account, VoteDecision(
+                face_system.VOTE_WINDOW, face_system.GRANT_VOTES,
+                face_system.VOTE_WINDOW + 1
+            ))
+            if (votes.vote(account in matched) == "granted"
+                    and (not face_system.LIVENESS
+                         or account in entrance.liveness
+                         and entrance.liveness[account].verdict)):
+                return account
+        return None
+
+    def _check_liveness(self, entrance, results, frame, threshold):
+        """Feed each matching account's face crop to its liveness check (locked).
+
+        Returns True if a check failed.
+        """
+        gray = None
+        seen = set()
+        for (x, y, w, h), name, distance in results:
+            if name is None or distance >= threshold or name in seen:
+                continue
+            seen.add(name)
+            if gray is None:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            check = entrance.liveness.get(name)
+            if check is None:
+                check = entrance.liveness[name] = LivenessCheck(
+                    face_system.eye_cascade.get())
+            with metrics.stage("liveness"):
+                check.update(gray[y:y+h, x:x+w])
+        return any(check.verdict is False for check in entrance.liveness.values())
+
+    def _decide(self, entrance, results, frame):
+        now = time.monotonic()
+        # Read on every decision so a threshold edited in the config applies.
+        threshold = face_system.match_threshold()
+        with entrance.lock:
+            if results and face_system.LIVENESS and self._check_liveness(
+                    entrance, results, frame, threshold):
+                # A matching face failed liveness: treat it as a spoof.
+                entrance.reset()
+                lock_door(entrance.name)
+                metrics.count("denials")
+                box = next((b for b, name, distance in results
+                            if name is not None and distance < threshold), None)
+                face_system.events.publish("stranger", door=entrance.name,
+                                           frame=frame, box=box, reason="liveness")
+                self.notify(entrance, "denied", "liveness")
+                return
+
+            account = self._vote(entrance, results, threshold) if results else None
+            if account is not None:
+                newly_unlocked = not face_system.locks.is_unlocked(entrance.name)
+                unlock_door(entrance.name)
+                check = entrance.liveness.get(account)
+                entrance.reset()
+                if newly_unlocked:
+                    metrics.count("grants")
+                    box = next((b for b, name, _ in results if name == account), None)
+                    detail = {"liveness": check.signals()} if check is not None else {}
+                    face_system.events.publish("granted", account, door=entrance.name,
+                                               frame=frame, box=box, **detail)
+                    self.notify(entrance, "granted", account)
+                return
+
+            if results and entrance.scan_start is None:
+                entrance.scan_start = now
+            if (entrance.scan_start is not None
+                    and now - entrance.scan_start >= face_system.DOOR_SCAN_WINDOW):
+                # A face was seen but never matched (or proved live)
+                # within the window.
+                entrance.reset()
+                lock_door(entrance.name)
+                metrics.count("denials")
+                box = max((b for b, _, _ in results), key=lambda b: b[2] * b[3],
+                          default=None)
+                face_system.events.publish("stranger", door=entrance.name,
+                                           frame=frame, box=box)
+                self.notify(entrance, "denied")
+
+    def _lock_changed(self, door, unlocked, reason):
+        # Relocking is timed by the lock controller (see doorlock.py).
+        if reason in ("auto", "watchdog"):
+            for entrance in self.entrances:
+                if entrance.name == door:
+                    self.notify(entrance, "auto_lock")
+
+
+def run(entrances=ENTRANCES, logger=None):
+    logger = logger or SimpleLogger("visitor_log.csv", async_writes=True,
+                                    retention_days=face_system.LOG_RETENTION_DAYS)
+    # The entrances register their own doors in CameraManager.start().
+    face_system.setup(default_door=False, logger=logger)
+
+    def on_event(entrance, event, detail=None):
+        door = entrance.name
+        if event == "granted":
+            logger.log_event(detail, f"UNLOCK:{door}")
+        elif event == "denied":
+            logger.log_event("Unknown", f"DENIED:{door}", event_type="STRANGER_ALERT")
+        elif event == "auto_lock":
+            logger.log_event("System", f"AUTO_LOCK:{door}")
+        elif event == "error":
+            print(f"[{door}] recognition failed: {detail}")
+
+    manager = CameraManager(entrances, on_event=on_event)
+    manager.start()
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    run()
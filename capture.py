@@ -0,0 +1,254 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from metrics import metrics
+
+
+class FrameGrabber:
+    """Reads a cv2.VideoCapture on its own thread and keeps only the newest frames.
+
+    Consumers call read() at their own pace and always get the most recent
+    frame; anything older that was never handed out is counted as dropped.
+    """
+
+    def __init__(self, cap, buffer_size=2):
+        self.cap = cap
+        self.frames = deque(maxlen=buffer_size)
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.seq = 0                # id of the newest captured frame
+        self.last_read_seq = 0      # id of the last frame handed out
+        self.last_read_time = None  # capture time of the last frame handed out
+        self.stopped = False        # reader hit end of stream / camera error
+        self.interval = 0.0         # seconds to sleep between reads (idle mode)
+
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_latency = 0.0     # age of the last frame when it was read
+        self.decision_latency = 0.0 # capture-to-decision time of last decision
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.stopped = False
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _reader(self):
+        while self.running:
+            if self.interval:
+                time.sleep(self.interval)
+            with metrics.stage("cap_read"):
+                ret, frame = self.cap.read()
+            captured_at = time.monotonic()
+            with self.cond:
+                if not ret:
+                    self.stopped = True
+                    self.running = False
+                    self.cond.notify_all()
+                    return
+                if len(self.frames) == self.frames.maxlen:
+                    # The oldest buffered frame is about to fall off unread.
+                    if self.frames[0][0] > self.last_read_seq:
+                        self.frames_dropped += 1
+                self.seq += 1
+                self.frames_captured += 1
+                self.frames.append((self.seq, captured_at, frame))
+                self.cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """Return (ret, frame) for the newest frame not yet handed out.
+
+        Blocks until a fresh frame arrives, mirroring cv2.VideoCapture.read().
+        """
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.seq <= self.last_read_seq:
+                remaining = deadline - time.monotonic()
+                if self.stopped or remaining <= 0:
+                    return False, None
+                self.cond.wait(remaining)
+
+            seq, captured_at, frame = self.frames[-1]
+            # Older buffered frames are superseded by this one.
+            self.frames_dropped += sum(
+                1 for s, _, _ in self.frames if self.last_read_seq < s < seq
+            )
+            self.frames.clear()
+            self.last_read_seq = seq
+            self.last_read_time = captured_at
+            self.read_latency = time.monotonic() - captured_at
+            metrics.observe("frame_age", self.read_latency)
+            return True, frame
+
+    def note_decision(self):
+        """Record end-to-end latency from the last frame read to a decision."""
+        if self.last_read_time is not None:
+            self.decision_latency = time.monotonic() - self.last_read_time
+            metrics.observe("decision_latency", self.decision_latency)
+        return self.decision_latency
+
+    def stats(self):
+        with self.cond:
+            return {
+                "frames_captured": self.frames_captured,
+                "frames_dropped": self.frames_dropped,
+                "read_latency": self.read_latency,
+                "decision_latency": self.decision_latency,
+            }
+
+    def release(self):
+        self.stop()
+        self.cap.release()
+
+
+class ManagedCamera:
+    """Opens a camera (index, file or URL) on first use and closes it when idle.
+
+    Drop-in for FrameGrabber. The device is opened by the first read() (or
+    open(), to pre-warm it), released once no frame has been read for
+    idle_timeout seconds, and reopened on the next read. If the device
+    cannot be opened or stops delivering frames, reads fail fast until a
+    retry delay has passed; the delay doubles with every consecutive
+    failure, up to max_backoff seconds.
+    """
+
+    def __init__(self, source=0, buffer_size=2, idle_timeout=60.0,
+                 backoff=0.5, max_backoff=30.0):
+        self.source = source
+        self.buffer_size = buffer_size
+        self.idle_timeout = idle_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.lock = threading.Lock()
+        self.grabber = None
+        self.reaper = None
+        self.last_used = 0.0
+        self.failures = 0
+        self.retry_at = 0.0
+        self._interval = 0.0
+        # Totals from grabbers that have since been closed.
+        self.closed_captured = 0
+        self.closed_dropped = 0
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @interval.setter
+    def interval(self, value):
+        self._interval = value
+        grabber = self.grabber
+        if grabber is not None:
+            grabber.interval = value
+
+    @property
+    def frames_captured(self):
+        grabber = self.grabber
+        return self.closed_captured + (grabber.frames_captured if grabber else 0)
+
+    @property
+    def frames_dropped(self):
+        grabber = self.grabber
+        return self.closed_dropped + (grabber.frames_dropped if grabber else 0)
+
+    def _fail(self):
+        self.failures += 1
+        delay = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1))
+        self.retry_at = time.monotonic() + delay
+
+    def _close(self):
+        grabber, self.grabber = self.grabber, None
+        if grabber is not None:
+            grabber.release()
+            self.closed_captured += grabber.frames_captured
+            self.closed_dropped += grabber.frames_dropped
+
+    def _open(self):
+        """Return the running grabber, opening the device if needed (locked)."""
+        self.last_used = time.monotonic()
+        if self.grabber is not None:
+            return self.grabber
+        if self.last_used < self.retry_at:
+            return None
+
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            self._fail()
+            return None
+
+        self.grabber = FrameGrabber(cap, self.buffer_size)
+        self.grabber.interval = self._interval
+        self.grabber.start()
+        if self.reaper is None:
+            self.reaper = threading.Thread(target=self._reap, daemon=True)
+            self.reaper.start()
+        return self.grabber
+
+    def _reap(self):
+        while True:
+            time.sleep(max(0.1, min(self.idle_timeout / 2.0, 5.0)))
+            with self.lock:
+                if (self.grabber is not None
+                        and time.monotonic() - self.last_used >= self.idle_timeout):
+                    self._close()
+                if self.grabber is None:
+                    self.reaper = None
+                    return
+
+    def open(self):
+        """Open the device now, e.g. to pre-warm it. Returns True on success."""
+        with self.lock:
+            return self._open() is not None
+
+    def read(self, timeout=1.0):
+        with self.lock:
+            grabber = self._open()
+        if grabber is None:
+            return False, None
+
+        ret, frame = grabber.read(timeout)
+        if ret:
+            self.failures = 0
+        elif grabber.stopped:
+            # The device stopped delivering frames: close it and retry later.
+            with self.lock:
+                if self.grabber is grabber:
+                    self._close()
+                    self._fail()
+        return ret, frame
+
+    def note_decision(self):
+        grabber = self.grabber
+        return grabber.note_decision() if grabber is not None else 0.0
+
+    def stats(self):
+        grabber = self.grabber
+        stats = grabber.stats() if grabber is not None else {
+            "read_latency": 0.0, "decision_latency": 0.0,
+        }
+        stats.update(frames_captured=self.frames_captured,
+                     frames_dropped=self.frames_dropped,
+                     open=grabber is not None,
+                     failures=self.failures)
+        return stats
+
+    def release(self):
+        with self.lock:
+            self._close()
@@ -0,0 +1,231 @@
+"""Typed settings from a JSON file and FACE_* environment variables.
+
+Every tunable has an entry in SCHEMA with its type, bounds and whether it
+can change while running ("live") or only takes effect on the next start
+(camera source, lock pin, dataset directory, backends...). The default
+stays next to where the value is used: face_system reads each setting as
+`settings.get(NAME, default)`.
+
+Values come from, lowest precedence first: the default, the config file
+(lower-case keys, e.g. {"confidence_threshold": 65}) and the environment
+(FACE_CONFIDENCE_THRESHOLD=65). Everything is validated on load; a bad
+file at startup raises ConfigError, a bad edit later is reported and
+ignored. watch() polls the file and hands changed live values to the
+subscribers, so thresholds can be tuned on a running door without
+reopening the camera or reloading the model.
+"""
+import json
+import os
+import threading
+import time
+
+
+class ConfigError(ValueError):
+    pass
+
+
+class Setting:
+    def __init__(self, type, minimum=None, maximum=None, choices=None,
+                 optional=False, live=True):
+        self.type = type
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+        self.optional = optional
+        self.live = live
+
+    def parse(self, name, value):
+        """Validate value (from JSON, or a string from the environment)."""
+        if isinstance(value, str) and self.type is not str:
+            text = value.strip()
+            if self.optional and text.lower() in ("", "none", "null"):
+                return None
+            if self.type is bool:
+                if text.lower() not in ("1", "0", "true", "false", "yes", "no", "on", "off"):
+                    raise ConfigError(f"{name}: expected a boolean, got {value!r}")
+                value = text.lower() in ("1", "true", "yes", "on")
+            elif self.type == "source":
+                value = int(text) if text.lstrip("-").isdigit() else text
+            else:
+                try:
+                    value = self.type(text)
+                except ValueError:
+                    raise ConfigError(f"{name}: expected {self.type.__name__}, "
+                                      f"got {value!r}") from None
+
+        if value is None:
+            if self.optional:
+                return None
+            raise ConfigError(f"{name}: a value is required")
+        if self.type == "source":
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                raise ConfigError(f"{name}: expected a device index or a path/URL")
+            return value
+        if self.type is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if not isinstance(value, self.type) or (self.type is int and isinstance(value, bool)):
+            raise ConfigError(f"{name}: expected {self.type.__name__}, got {value!r}")
+        if self.choices is not None and value not in self.choices:
+            raise ConfigError(f"{name}: must be one of {sorted(self.choices)}")
+        if self.minimum is not None and value < self.minimum:
+            raise ConfigError(f"{name}: must be at least {self.minimum}")
+        if self.maximum is not None and value > self.maximum:
+            raise ConfigError(f"{name}: must be at most {self.maximum}")
+        return value
+
+
+DETECTORS = ("haar", "yunet")
+RECOGNIZERS = ("lbph", "gallery", "sface")
+
+SCHEMA = {
+    # Storage, hardware and backends: read once at startup.
+    "DATASET_DIR": Setting(str, live=False),
+    "CAMERA_SOURCE": Setting("source", live=False),
+    "LOCK_PIN": Setting(int, 0, 40, live=False),
+    "DETECTOR_BACKEND": Setting(str, choices=DETECTORS, live=False),
+    "RECOGNIZER_BACKEND": Setting(str, choices=RECOGNIZERS, live=False),
+    "ATTEMPT_LIMIT": Setting(int, 1, live=False),
+    "ATTEMPT_WINDOW": Setting(float, 1.0, live=False),
+    "LOCKOUT": Setting(float, 0.0, live=False),
+    "MAX_LOCKOUT": Setting(float, 0.0, live=False),
+    "EMPTY_SCAN_LIMIT": Setting(int, 1, live=False),
+    "EMPTY_SCAN_WINDOW": Setting(float, 1.0, live=False),
+    "PASSWORD_HASH_SECONDS": Setting(float, 0.01, 5.0, live=False),
+    "SNAPSHOT_MAX_MB": Setting(float, 0.0, live=False),
+    "WEBHOOK_URL": Setting(str, optional=True, live=False),
+    "LOG_RETENTION_DAYS": Setting(int, 0, live=False),
+    "METRICS": Setting(bool, live=False),
+    "METRICS_FILE": Setting(str, live=False),
+    "METRICS_INTERVAL": Setting(float, 1.0, live=False),
+    # Timings.
+    "CAMERA_IDLE_TIMEOUT": Setting(float, 1.0),
+    "UNLOCK_DURATION": Setting(float, 1.0, 600.0),
+    "WATCHDOG_TIMEOUT": Setting(float, 0.5),
+    "VERIFY_SCAN_WINDOW": Setting(float, 1.0, 60.0),
+    "RESULT_HOLD": Setting(float, 0.0, 60.0),
+    "DOOR_SCAN_WINDOW": Setting(float, 1.0, 60.0),
+    # Detection and recognition.
+    "DETECT_SCALE_FACTOR": Setting(float, 1.01, 2.0),
+    "DETECT_MIN_NEIGHBORS": Setting(int, 0, 20),
+    "DETECT_EVERY": Setting(int, 1, 60),
+    "REPREDICT_EVERY": Setting(int, 1, 60),
+    "CONFIDENCE_THRESHOLD": Setting(float, 0.0, optional=True),
+    "DUPLICATE_THRESHOLD": Setting(float, 0.0, optional=True),
+    "VOTE_WINDOW": Setting(int, 1, 100),
+    "GRANT_VOTES": Setting(int, 1, 100),
+    "DENY_VOTES": Setting(int, 1, 100),
+    "LIVENESS": Setting(bool),
+}
+
+
+def _cross_check(values):
+    window = values.get("VOTE_WINDOW")
+    for name in ("GRANT_VOTES", "DENY_VOTES"):
+        if window is not None and values.get(name) is not None and values[name] > window:
+            raise ConfigError(f"{name} ({values[name]}) cannot exceed VOTE_WINDOW ({window})")
+    # SFace aligns faces on YuNet's landmarks; the Haar cascade has none.
+    if (values.get("RECOGNIZER_BACKEND") == "sface"
+            and values.get("DETECTOR_BACKEND", "yunet") != "yunet"):
+        raise ConfigError("RECOGNIZER_BACKEND 'sface' needs DETECTOR_BACKEND 'yunet'")
+
+
+class Config:
+    """Settings for one config file; see the module docstring."""
+
+    ENV_PREFIX = "FACE_"
+
+    def __init__(self, path="config.json", environ=None):
+        self.path = path
+        self.environ = os.environ if environ is None else environ
+        self.defaults = {}
+        self.values = self._read()
+        self.subscribers = []
+        self.stamp = self._stamp()
+        self.thread = None
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _read(self):
+        """Validated {NAME: value} from the file and the environment."""
+        raw = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                raise ConfigError(f"{self.path}: {e}") from None
+            if not isinstance(data, dict):
+                raise ConfigError(f"{self.path}: expected a JSON object")
+            for key, value in data.items():
+                name = key.upper()
+                if name not in SCHEMA:
+                    raise ConfigError(f"{self.path}: unknown setting {key!r}")
+                raw[name] = value
+        for name in SCHEMA:
+            if self.ENV_PREFIX + name in self.environ:
+                raw[name] = self.environ[self.ENV_PREFIX + name]
+
+        values = {name: SCHEMA[name].parse(name, value) for name, value in raw.items()}
+        _cross_check({**self.defaults, **values})
+        return values
+
+    def get(self, name, default):
+        """The configured value of name, else default (validated too)."""
+        if name not in SCHEMA:
+            raise KeyError(name)
+        self.defaults[name] = SCHEMA[name].parse(name, default)
+        return self.values.get(name, self.defaults[name])
+
+    def validate(self):
+        """Cross-check settings once every default is known (raises ConfigError)."""
+        _cross_check({**self.defaults, **self.values})
+
+    def current(self, name):
+        return self.values.get(name, self.defaults.get(name))
+
+    def subscribe(self, fn):
+        """fn({NAME: value}) is called with the live settings that changed."""
+        self.subscribers.append(fn)
+        return fn
+
+    def reload(self):
+        """Re-read the file; returns the live changes applied."""
+        try:
+            values = self._read()
+        except ConfigError as e:
+            print(f"[config] not reloaded, keeping current settings: {e}")
+            return {}
+        previous = {name: self.current(name) for name in SCHEMA}
+        self.values = values
+        changed = {name: self.current(name) for name in SCHEMA
+                   if self.current(name) != previous[name]}
+
+        live = {name: value for name, value in changed.items() if SCHEMA[name].live}
+        for name in changed.keys() - live.keys():
+            print(f"[config] {name} changes on the next restart")
+            # Keep reporting the value actually in use.
+            self.values[name] = previous[name]
+        if live:
+            print("[config] applied " + ", ".join(f"{k}={v!r}" for k, v in sorted(live.items())))
+            for fn in list(self.subscribers):
+                fn(live)
+        return live
+
+    def watch(self, interval=2.0):
+        """Reload whenever the file changes, polled from a daemon thread."""
+        if self.thread is not None:
+            return
+        def run():
+            while True:
+                time.sleep(interval)
+                stamp = self._stamp()
+                if stamp != self.stamp:
+                    self.stamp = stamp
+                    self.reload()
+        self.thread = threading.Thread(target=run, daemon=True, name="config-watch")
+        self.thread.start()
@@ -0,0 +1,112 @@
+"""Password hashing: salted scrypt with a cost calibrated to the host CPU.
+
+Hashes are stored as "scrypt$<n>$<r>$<p>$<salt>$<key>" (salt and key
+base64). Older accounts have an unsalted SHA-256 hex digest; those still
+verify, and needs_rehash() tells the caller to store a new hash once the
+password is known to be right. All comparisons are constant time.
+
+scrypt is slow on purpose. calibrate() picks the largest n (memory and
+time both grow with it) that hashes within a target time on this machine,
+and load_cost() caches the result in a small JSON file so that only the
+first run pays for calibration.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+PREFIX = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+MIN_N = 2 ** 14
+MAX_N = 2 ** 17         # 128 MiB at r=8; keep headroom on a 1 GB board
+DEFAULT_COST = {"n": MIN_N, "r": 8, "p": 1}
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    # hashlib refuses to use more than maxmem; scrypt needs about 128*n*r bytes.
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=129 * n * r * p + 2 ** 20, dklen=KEY_BYTES)
+
+
+def hash_password(password, cost=None):
+    cost = cost or DEFAULT_COST
+    n, r, p = cost["n"], cost["r"], cost["p"]
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f"{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(key)}"
+
+
+def _parse(hashed):
+    """(n, r, p, salt, key) for an scrypt hash, or None if it is not one."""
+    parts = hashed.split("$")
+    if len(parts) != 6 or parts[0] != PREFIX:
+        return None
+    try:
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        return n, r, p, base64.b64decode(parts[4]), base64.b64decode(parts[5])
+    except ValueError:
+        return None
+
+
+def is_legacy(hashed):
+    return _parse(hashed) is None
+
+
+def verify_password(password, hashed):
+    if not hashed:
+        return False
+    parsed = _parse(hashed)
+    if parsed is None:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy.encode(), hashed.strip().lower().encode())
+    n, r, p, salt, key = parsed
+    try:
+        return hmac.compare_digest(_scrypt(password, salt, n, r, p), key)
+    except (ValueError, MemoryError):
+        return False
+
+
+def needs_rehash(hashed, cost):
+    """True for legacy hashes and for scrypt hashes made with another cost."""
+    parsed = _parse(hashed)
+    return parsed is None or parsed[:3] != (cost["n"], cost["r"], cost["p"])
+
+
+def calibrate(target_seconds, r=8, p=1, min_n=MIN_N, max_n=MAX_N):
+    """The largest cost, from min_n up to max_n, that hashes within target_seconds."""
+    salt = secrets.token_bytes(SALT_BYTES)
+    n = min_n
+    while n < max_n:
+        start = time.perf_counter()
+        _scrypt("calibration", salt, n * 2, r, p)
+        if time.perf_counter() - start > target_seconds:
+            break
+        n *= 2
+    return {"n": n, "r": r, "p": p}
+
+
+def load_cost(path, target_seconds):
+    """The cost stored at path, calibrating and storing it on first use."""
+    try:
+        with open(path, "r") as f:
+            cost = json.load(f)
+        if (cost.get("target_seconds") == target_seconds
+                and all(isinstance(cost.get(k), int) for k in ("n", "r", "p"))):
+            return {k: cost[k] for k in ("n", "r", "p")}
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    cost = calibrate(target_seconds)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(dict(cost, target_seconds=target_seconds), f)
+    os.replace(tmp_path, path)
+    return cost
@@ -0,0 +1,37 @@
+from collections import deque
+
+
+class VoteDecision:
+    """Sliding-window vote over per-frame recognition results.
+
+    Each fresh prediction of a face casts one vote: matched or not. Access
+    is granted once grant_votes of the last `window` votes matched, so one
+    lucky frame cannot unlock the door, and denied early once deny_votes of
+    them missed. Frames without a face, or whose prediction is a cached
+    repeat, cast no vote.
+    """
+
+    def __init__(self, window=12, grant_votes=3, deny_votes=12):
+        self.votes = deque(maxlen=window)
+        self.grant_votes = grant_votes
+        self.deny_votes = deny_votes
+        self.decision = None
+
+    def vote(self, matched):
+        """Record one vote; returns "granted", "denied" or None (undecided)."""
+        if self.decision is None:
+            self.votes.append(bool(matched))
+            hits = sum(self.votes)
+            if hits >= self.grant_votes:
+                self.decision = "granted"
+            elif len(self.votes) - hits >= self.deny_votes:
+                self.decision = "denied"
+        return self.decision
+
+    @property
+    def matches(self):
+        return sum(self.votes)
+
+    def reset(self):
+        self.votes.clear()
+        self.decision = None
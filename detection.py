@@ -0,0 +1,101 @@
+import math
+
+import cv2
+
+
+class FaceDetector:
+    """Haar cascade detection on a downscaled frame with ROI refinement.
+
+    The cascade runs on a copy of the frame resized to detect_width pixels
+    wide and the boxes are mapped back to full resolution, so callers still
+    crop faces from the full-resolution image. When the previous face boxes
+    are passed in, the cascade first runs only inside a padded window around
+    each of them at a narrow range of scales, falling back to the downscaled
+    full-frame pass if nothing is found there. Every full_every-th call does
+    a full-frame pass anyway so new faces entering the scene are picked up.
+
+    minSize/maxSize come from the expected distance range at the door: a
+    face face_width metres wide seen through a lens with fov_degrees of
+    horizontal field of view.
+    """
+
+    def __init__(self, cascade, detect_width=400, scale_factor=1.2,
+                 min_neighbors=4, roi_refine=True, roi_padding=0.5,
+                 full_every=3, min_distance=0.3, max_distance=2.0,
+                 fov_degrees=60.0, face_width=0.15):
+        self.cascade = cascade
+        self.detect_width = detect_width
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.roi_refine = roi_refine
+        self.roi_padding = roi_padding
+        self.full_every = full_every
+        self.roi_passes = 0
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.fov_degrees = fov_degrees
+        self.face_width = face_width
+
+    def size_limits(self, frame_width):
+        """Expected face width range in pixels for a frame this wide."""
+        focal = frame_width / (2 * math.tan(math.radians(self.fov_degrees) / 2))
+        smallest = focal * self.face_width / self.max_distance
+        largest = focal * self.face_width / self.min_distance
+        return int(smallest), int(math.ceil(largest))
+
+    def _cascade(self, gray, min_w, max_w):
+        return self.cascade.detectMultiScale(
+            gray, self.scale_factor, self.min_neighbors,
+            minSize=(max(1, min_w), max(1, min_w)),
+            maxSize=(max_w, max_w)
+        )
+
+    def _detect_downscaled(self, gray):
+        frame_h, frame_w = gray.shape[:2]
+        min_w, max_w = self.size_limits(frame_w)
+        scale = min(1.0, self.detect_width / float(frame_w))
+        if scale < 1.0:
+            small = cv2.resize(gray, (self.detect_width, round(frame_h * scale)),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+
+        # The cascade cannot find faces below its 24px training window.
+        boxes = self._cascade(small, max(24, int(min_w * scale)),
+                              int(math.ceil(max_w * scale)))
+        return [tuple(int(round(v / scale)) for v in box) for box in boxes]
+
+    def _detect_roi(self, gray, box):
+        x, y, w, h = box
+        frame_h, frame_w = gray.shape[:2]
+        pad_x, pad_y = int(w * self.roi_padding), int(h * self.roi_padding)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(frame_w, x + w + pad_x), min(frame_h, y + h + pad_y)
+
+        # Scale the window so the face is a little over the cascade minimum.
+        scale = min(1.0, 48.0 / w)
+        roi = gray[y0:y1, x0:x1]
+        if scale < 1.0:
+            roi = cv2.resize(roi, (max(1, round((x1 - x0) * scale)),
+                                   max(1, round((y1 - y0) * scale))),
+                             interpolation=cv2.INTER_AREA)
+
+        boxes = self._cascade(roi, int(w * scale * 0.7),
+                              int(math.ceil(w * scale * 1.4)))
+        return [(x0 + int(round(bx / scale)), y0 + int(round(by / scale)),
+                 int(round(bw / scale)), int(round(bh / scale)))
+                for (bx, by, bw, bh) in boxes]
+
+    def detect(self, gray, previous=()):
+        """Return full-resolution (x, y, w, h) face boxes for a gray frame."""
+        if self.roi_refine and previous and self.roi_passes + 1 < self.full_every:
+            self.roi_passes += 1
+            boxes = []
+            for box in previous:
+                boxes.extend(self._detect_roi(gray, box))
+            if boxes:
+                return boxes
+        self.roi_passes = 0
+        return self._detect_downscaled(gray)
+
+    __call__ = detect
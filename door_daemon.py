@@ -0,0 +1,87 @@
+"""Headless door mode: watch for motion, then scan and unlock for known faces.
+
+Run with `python door_daemon.py` (for example from a systemd unit so it
+starts on boot). No Tk window or OpenCV preview is opened.
+"""
+import time
+
+import cv2
+
+from events import LogSink
+import face_system
+from face_system import (events, grabber, log_auto_locks, prewarm,
+                         scan_for_face, setup, unlock_door, lock_door)
+from log import SimpleLogger
+
+IDLE_INTERVAL = 0.2      # seconds between motion checks while idle
+
+
+class MotionDetector:
+    """Frame-difference motion check on a small blurred grayscale copy."""
+
+    def __init__(self, width=160, pixel_threshold=25, min_changed=0.01):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.previous = None
+
+    def moved(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, h * self.width // w)),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        previous, self.previous = self.previous, gray
+        if previous is None:
+            return False
+
+        diff = cv2.absdiff(previous, gray)
+        changed = cv2.countNonZero(
+            cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]
+        )
+        return changed >= self.min_changed * gray.size
+
+
+def run(logger=None):
+    logger = logger or SimpleLogger("visitor_log.csv", async_writes=True,
+                                    retention_days=face_system.LOG_RETENTION_DAYS)
+    setup(logger=logger)
+    motion = MotionDetector()
+    # UNLOCK and STRANGER_ALERT rows come from the events scan_for_face publishes.
+    events.subscribe(LogSink(logger))
+    log_auto_locks(logger)
+
+    # Fail-secure: always start locked.
+    lock_door()
+    grabber.interval = IDLE_INTERVAL
+    prewarm()
+
+    try:
+        while True:
+            ret, frame = grabber.read()
+            if not ret:
+                # Camera unavailable; stay locked and try again shortly.
+                time.sleep(1.0)
+                continue
+
+            if not motion.moved(frame):
+                continue
+
+            grabber.interval = 0.0
+            name, saw_face = scan_for_face(face_system.DOOR_SCAN_WINDOW)
+            grabber.interval = IDLE_INTERVAL
+            motion.previous = None
+
+            if name is not None:
+                unlock_door()
+            elif saw_face:
+                lock_door()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lock_door()
+        grabber.release()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,297 @@
+"""Door lock controller: hardware drivers, timed auto-relock and a watchdog.
+
+LockController owns every door's lock state. It drives the locks through
+a driver (RPi.GPIO when installed, else SimulatedDriver, which prints and
+records what it was told to do) and measures how long each actuation
+takes. Auto-relock deadlines for all doors, and the watchdog, live on one
+TimerWheel thread instead of one timer thread each.
+
+The watchdog covers the vision loops: while a loop is inside
+watching(name, door), it must call heartbeat(name) at least every
+watchdog_timeout seconds, or its door (every door if it has none) is
+locked. Each loop has its own timer, so one camera that keeps running
+cannot hide another that hung. A loop that leaves watching() with an
+exception locks its door as well (fail-secure).
+"""
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import metrics
+
+
+class GPIODriver:
+    """RPi.GPIO, BCM numbering; a high pin energises (opens) the lock."""
+
+    def __init__(self, gpio):
+        self.gpio = gpio
+        gpio.setmode(gpio.BCM)
+
+    def setup(self, pin):
+        self.gpio.setup(pin, self.gpio.OUT)
+
+    def set(self, pin, unlocked):
+        self.gpio.output(pin, self.gpio.HIGH if unlocked else self.gpio.LOW)
+
+
+class SimulatedDriver:
+    """Stand-in for machines without GPIO: prints and records pin states."""
+
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self.pins = {}          # pin -> True when unlocked
+        self.history = []       # (time, pin, unlocked)
+
+    def setup(self, pin):
+        self.pins.setdefault(pin, False)
+
+    def set(self, pin, unlocked):
+        self.pins[pin] = unlocked
+        self.history.append((time.monotonic(), pin, unlocked))
+        if self.verbose:
+            print(f"[LOCK {pin}] {'UNLOCKED' if unlocked else 'LOCKED'}")
+
+
+def default_driver():
+    try:
+        import RPi.GPIO as GPIO
+    except ModuleNotFoundError:
+        return SimulatedDriver()
+    return GPIODriver(GPIO)
+
+
+class TimerWheel:
+    """Runs callbacks at deadlines on a single thread (hashed timing wheel).
+
+    Timers are bucketed by deadline tick, so schedule() and cancel() take
+    constant time however many are pending. A key names each timer;
+    scheduling a key again replaces its timer. Callbacks run on the wheel
+    thread, up to one tick late, and must not block.
+    """
+
+    def __init__(self, tick=0.05, slots=256):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]
+        self.where = {}         # key -> slot index
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def schedule(self, key, delay, callback):
+        deadline = time.monotonic() + delay
+        with self.cond:
+            self._cancel(key)
+            index = int(deadline / self.tick) % len(self.slots)
+            self.slots[index][key] = (deadline, callback)
+            self.where[key] = index
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True,
+                                               name="timer-wheel")
+                self.thread.start()
+            self.cond.notify()
+
+    def cancel(self, key):
+        with self.cond:
+            self._cancel(key)
+
+    def _cancel(self, key):
+        index = self.where.pop(key, None)
+        if index is not None:
+            del self.slots[index][key]
+
+    def pending(self, key):
+        with self.cond:
+            return key in self.where
+
+    def _due(self, now, next_tick):
+        """Pop callbacks from the slots of ticks next_tick.. before now's tick."""
+        current = int(now / self.tick)
+        ticks = range(next_tick, current)
+        if len(ticks) > len(self.slots):
+            ticks = range(current - len(self.slots), current)
+        due = []
+        for t in ticks:
+            slot = self.slots[t % len(self.slots)]
+            for key, (deadline, callback) in list(slot.items()):
+                if deadline <= now:     # later rounds share the slot
+                    del slot[key]
+                    del self.where[key]
+                    due.append(callback)
+        return due, current
+
+    def _run(self):
+        next_tick = int(time.monotonic() / self.tick)
+        while True:
+            with self.cond:
+                while not self.where:
+                    self.cond.wait()
+                    next_tick = int(time.monotonic() / self.tick)
+                due, next_tick = self._due(time.monotonic(), next_tick)
+                if not due:
+                    self.cond.wait((next_tick + 1) * self.tick - time.monotonic())
+            for callback in due:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"[doorlock] timer callback failed: {e}")
+
+
+class LockController:
+    """Thread-safe lock state for any number of doors.
+
+    unlock() opens a door and schedules it to lock again after `duration`
+    (relock_after by default; None or 0 keeps it open). Listeners added
+    with subscribe() are called as listener(door, unlocked, reason) after
+    every change, where reason is "unlock", "manual", "auto" (relock
+    timer), "watchdog", "error" or "shutdown"; they may run on the wheel
+    thread and must not block.
+    """
+
+    def __init__(self, driver=None, relock_after=15.0, watchdog_timeout=5.0,
+                 wheel=None):
+        self.driver = driver
+        self.relock_after = relock_after
+        self.watchdog_timeout = watchdog_timeout
+        self.wheel = wheel or TimerWheel()
+        self.lock = threading.RLock()
+        self.pins = {}          # door -> pin
+        self.unlocked = set()
+        self.listeners = []
+        self.watchers = {}      # watcher name -> door it guards (None: all)
+        self.actuations = 0
+        self.last_actuation = None
+        self.max_actuation = 0.0
+
+    def _hardware(self):
+        # Created on first use, so importing this never touches GPIO.
+        if self.driver is None:
+            self.driver = default_driver()
+        return self.driver
+
+    def _actuate(self, door, unlocked):
+        start = time.perf_counter()
+        self._hardware().set(self.pins[door], unlocked)
+        elapsed = time.perf_counter() - start
+        metrics.observe("lock_actuation", elapsed)
+        self.actuations += 1
+        self.last_actuation = elapsed
+        self.max_actuation = max(self.max_actuation, elapsed)
+
+    def _notify(self, door, unlocked, reason):
+        for listener in list(self.listeners):
+            try:
+                listener(door, unlocked, reason)
+            except Exception as e:
+                print(f"[doorlock] listener failed: {e}")
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def add_door(self, door, pin):
+        """Register a door's lock pin and drive it locked."""
+        with self.lock:
+            if not self.pins:
+                # Nothing to lock at exit until the first door exists.
+                atexit.register(self.lock_all, "shutdown")
+            self.pins[door] = pin
+            self._hardware().setup(pin)
+            self.wheel.cancel(("relock", door))
+            self._actuate(door, False)
+            self.unlocked.discard(door)
+
+    def doors(self):
+        with self.lock:
+            return list(self.pins)
+
+    def is_unlocked(self, door):
+        with self.lock:
+            return door in self.unlocked
+
+    def unlock(self, door, duration=None):
+        duration = self.relock_after if duration is None else duration
+        with self.lock:
+            opened = door not in self.unlocked
+            if opened:
+                try:
+                    self._actuate(door, True)
+                except Exception:
+                    self.lock_door(door, "error")
+                    raise
+                self.unlocked.add(door)
+            if duration:
+                self.wheel.schedule(("relock", door), duration,
+                                    lambda: self.lock_door(door, "auto"))
+            else:
+                self.wheel.cancel(("relock", door))
+        if opened:
+            self._notify(door, True, "unlock")
+
+    def lock_door(self, door, reason="manual"):
+        """Drive the door locked, even if it is already believed locked."""
+        with self.lock:
+            self.wheel.cancel(("relock", door))
+            was_unlocked = door in self.unlocked
+            self.unlocked.discard(door)
+            self._actuate(door, False)
+        if reason == "auto":
+            metrics.count("auto_relocks")
+        if was_unlocked:
+            self._notify(door, False, reason)
+
+    def lock_all(self, reason="manual"):
+        for door in self.doors():
+            try:
+                self.lock_door(door, reason)
+            except Exception as e:
+                print(f"[doorlock] could not lock {door}: {e}")
+
+    def _lock_guarded(self, door, reason):
+        if door is None:
+            self.lock_all(reason)
+        else:
+            self.lock_door(door, reason)
+
+    def heartbeat(self, name):
+        """Called by a vision loop on every iteration, inside watching(name)."""
+        if name in self.watchers and self.watchdog_timeout:
+            self.wheel.schedule(("watchdog", name), self.watchdog_timeout,
+                                lambda: self._watchdog(name))
+
+    def _watchdog(self, name):
+        with self.lock:
+            if name not in self.watchers:
+                return
+            door = self.watchers[name]
+        metrics.count("watchdog_locks")
+        print(f"[doorlock] {name} stalled for {self.watchdog_timeout}s; "
+              f"locking {door or 'all doors'}")
+        self._lock_guarded(door, "watchdog")
+
+    @contextmanager
+    def watching(self, name, door=None):
+        """Arm name's watchdog while a vision loop runs; lock door on errors."""
+        with self.lock:
+            self.watchers[name] = door
+        self.heartbeat(name)
+        try:
+            yield self
+        except BaseException:
+            self._lock_guarded(door, "error")
+            raise
+        finally:
+            with self.lock:
+                self.watchers.pop(name, None)
+                self.wheel.cancel(("watchdog", name))
+
+    def stats(self):
+        return {
+            "unlocked": sorted(self.unlocked),
+            "actuations": self.actuations,
+            "last_actuation": self.last_actuation,
+            "max_actuation": self.max_actuation,
+        }
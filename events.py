@@ -0,0 +1,323 @@
+"""Access events with JPEG snapshots, delivered to sinks in the background.
+
+face_system publishes "granted", "denied" (the claimed user did not match)
+and "stranger" (nobody enrolled matched) events on its EventBus. Every
+subscribed sink gets its own worker thread and queue, so a slow webhook
+never holds up the snapshot store and nothing here runs on the thread
+that makes the unlock decision. Snapshots are JPEG-encoded on first use by
+whichever worker needs them. A sink signals a failed delivery by raising;
+the event is retried with exponential backoff up to max_retries times.
+
+A sink is any object with handle(event).
+"""
+import atexit
+import base64
+import heapq
+import itertools
+import json
+import os
+import queue
+import re
+import smtplib
+import threading
+import time
+import urllib.request
+from email.message import EmailMessage
+
+import cv2
+
+JPEG_QUALITY = 85
+
+
+class Event:
+    def __init__(self, kind, user=None, door=None, frame=None, box=None,
+                 detail=None):
+        self.kind = kind
+        self.user = user
+        self.door = door
+        self.time = time.time()
+        self.frame = frame
+        self.box = tuple(int(v) for v in box) if box is not None else None
+        self.detail = detail or {}
+        self._jpegs = {}
+        self._lock = threading.Lock()
+
+    def image(self, part):
+        """The full "frame" or the "face" crop, or None if not available."""
+        if self.frame is None:
+            return None
+        if part == "frame":
+            return self.frame
+        if self.box is None:
+            return None
+        x, y, w, h = self.box
+        return self.frame[y:y+h, x:x+w]
+
+    def jpeg(self, part):
+        """JPEG bytes for image(part), encoded once and shared by all sinks."""
+        with self._lock:
+            if part not in self._jpegs:
+                image = self.image(part)
+                data = None
+                if image is not None and image.size:
+                    ok, buf = cv2.imencode(
+                        ".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+                    )
+                    data = buf.tobytes() if ok else None
+                self._jpegs[part] = data
+            return self._jpegs[part]
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "user": self.user,
+            "door": self.door,
+            "time": self.time,
+            "box": self.box,
+            "detail": self.detail,
+        }
+
+
+_STOP = object()
+
+
+class _SinkWorker:
+    def __init__(self, sink, max_queue, max_retries, backoff):
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retries = []           # heap of (due, seq, attempt, event)
+        self.seq = itertools.count()
+        self.thread = None
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True,
+                                           name=f"sink-{type(self.sink).__name__}")
+            self.thread.start()
+
+    def _deliver(self, event, attempt):
+        try:
+            self.sink.handle(event)
+            self.delivered += 1
+        except Exception as e:
+            if attempt >= self.max_retries:
+                self.failed += 1
+                print(f"[events] {type(self.sink).__name__} gave up on "
+                      f"{event.kind} event: {e}")
+                return
+            due = time.monotonic() + self.backoff * 2 ** attempt
+            heapq.heappush(self.retries, (due, next(self.seq), attempt + 1, event))
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self.retries:
+                timeout = max(0.0, self.retries[0][0] - time.monotonic())
+            try:
+                event = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                event = None
+            if event is _STOP:
+                return
+            if event is not None:
+                self._deliver(event, 0)
+
+            now = time.monotonic()
+            while self.retries and self.retries[0][0] <= now:
+                _, _, attempt, retry = heapq.heappop(self.retries)
+                self._deliver(retry, attempt)
+
+
+class EventBus:
+    """Fans events out to sinks, one background worker per sink."""
+
+    def __init__(self, max_queue=100, max_retries=5, backoff=1.0):
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.workers = []
+        atexit.register(self.close)
+
+    def subscribe(self, sink):
+        self.workers.append(
+            _SinkWorker(sink, self.max_queue, self.max_retries, self.backoff)
+        )
+        return sink
+
+    def unsubscribe(self, sink):
+        self.workers = [w for w in self.workers if w.sink is not sink]
+
+    def publish(self, kind, user=None, door=None, frame=None, box=None, **detail):
+        """Queue an event for every sink without blocking; returns the Event.
+
+        The frame is copied, so the caller may keep drawing on its own.
+        A sink whose queue is full drops the event.
+        """
+        event = Event(kind, user, door,
+                      frame.copy() if frame is not None else None, box, detail)
+        for worker in self.workers:
+            worker.start()
+            try:
+                worker.queue.put_nowait(event)
+            except queue.Full:
+                worker.dropped += 1
+        return event
+
+    def close(self, timeout=5.0):
+        """Deliver what is queued (not pending retries) and stop the workers."""
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.thread is not None:
+                try:
+                    worker.queue.put(_STOP, timeout=max(0.01, deadline - time.monotonic()))
+                except queue.Full:
+                    pass
+        for worker in self.workers:
+            if worker.thread is not None:
+                worker.thread.join(max(0.0, deadline - time.monotonic()))
+                worker.thread = None
+
+    def stats(self):
+        return {type(w.sink).__name__: {"delivered": w.delivered,
+                                        "failed": w.failed,
+                                        "dropped": w.dropped,
+                                        "retrying": len(w.retries)}
+                for w in self.workers}
+
+
+class SnapshotStore:
+    """Keeps each event's JPEGs in a directory, oldest evicted past max_bytes."""
+
+    def __init__(self, directory="snapshots", max_bytes=200 * 1024 * 1024,
+                 kinds=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.kinds = kinds
+        self.files = None           # [(path, size)] oldest first
+        self.total = 0
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".jpg") and os.path.isfile(path):
+                st = os.stat(path)
+                entries.append((st.st_mtime, path, st.st_size))
+        entries.sort()
+        self.files = [(path, size) for _, path, size in entries]
+        self.total = sum(size for _, size in self.files)
+
+    def handle(self, event):
+        if self.kinds is not None and event.kind not in self.kinds:
+            return
+        if self.files is None:
+            self._scan()
+
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(event.time))
+        stamp += f"-{int(event.time * 1000) % 1000:03d}"
+        user = re.sub(r"[^A-Za-z0-9_-]", "_", event.user or "unknown")
+        for part in ("face", "frame"):
+            data = event.jpeg(part)
+            if data is None:
+                continue
+            path = os.path.join(self.directory, f"{stamp}_{event.kind}_{user}_{part}.jpg")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.files.append((path, len(data)))
+            self.total += len(data)
+
+        while self.total > self.max_bytes and self.files:
+            path, size = self.files.pop(0)
+            self.total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class WebhookNotifier:
+    """POSTs events as JSON (face snapshot base64-encoded) to a URL."""
+
+    def __init__(self, url, kinds=("denied", "stranger"), timeout=5.0):
+        self.url = url
+        self.kinds = kinds
+        self.timeout = timeout
+
+    def handle(self, event):
+        if self.kinds is not None and event.kind not in self.kinds:
+            return
+        payload = event.to_dict()
+        face = event.jpeg("face")
+        if face is not None:
+            payload["face_jpeg"] = base64.b64encode(face).decode("ascii")
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload, default=str).encode(),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        # urlopen raises on connection errors and HTTP error statuses.
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class EmailNotifier:
+    """Emails events with the face and frame snapshots attached."""
+
+    def __init__(self, host, sender, recipients, port=25, username=None,
+                 password=None, starttls=False, kinds=("stranger",), timeout=10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.kinds = kinds
+        self.timeout = timeout
+
+    def handle(self, event):
+        if self.kinds is not None and event.kind not in self.kinds:
+            return
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.time))
+        message = EmailMessage()
+        message["Subject"] = f"Smart Door: {event.kind} ({event.user or 'unknown'})"
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content(
+            f"{event.kind} at {when}"
+            + (f" at door {event.door}" if event.door else "")
+            + (f" for {event.user}" if event.user else "") + "."
+        )
+        for part in ("face", "frame"):
+            data = event.jpeg(part)
+            if data is not None:
+                message.add_attachment(data, maintype="image", subtype="jpeg",
+                                       filename=f"{part}.jpg")
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+class LogSink:
+    """Writes decisions to a SimpleLogger in the rows the UI already uses."""
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def handle(self, event):
+        if event.kind == "granted":
+            self.logger.log_event(event.user, "UNLOCK")
+        elif event.kind in ("denied", "stranger"):
+            self.logger.log_event(event.user or "Unknown", "DENIED",
+                                  event_type="STRANGER_ALERT")
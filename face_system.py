@@ -1,286 +1,1238 @@
+import atexit
 import cv2
 import os
 import time
 import numpy as np
-import hashlib
 import shutil
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from capture import ManagedCamera
+from tracking import FaceTracker, box_iou
+from decision import VoteDecision
+from liveness import LivenessCheck
+from events import EventBus, SnapshotStore, WebhookNotifier
+from metrics import metrics
+from resources import LazyResource
+from gallery import LBPHGallery
+from roster import Roster
+from ratelimit import AttemptLimiter
+import credentials
+from doorlock import LockController
+from config import Config
+import backends
+
+
+# Tunables below are read through `settings` (see config.py): the value in
+# the code is the default, CONFIG_FILE and FACE_<NAME> environment
+# variables override it, and live settings are re-applied while running
+# when the file changes.
+CONFIG_FILE = os.environ.get("FACE_CONFIG", "config.json")
+CONFIG_RELOAD_INTERVAL = 2
+settings = Config(CONFIG_FILE)
+
+
+# Each door has its own lock channel; the single-door UI and daemon use
+# DEFAULT_DOOR on LOCK_PIN, cameras.py registers one door per entrance.
+# Locks go through a LockController (see doorlock.py): RPi.GPIO when it is
+# installed, else a simulated driver that prints. An unlocked door locks
+# again after UNLOCK_DURATION seconds, and a door is locked if a scan loop
+# running for it goes WATCHDOG_TIMEOUT seconds without a frame.
+LOCK_PIN = settings.get("LOCK_PIN", 18)
+DEFAULT_DOOR = "main"
+UNLOCK_DURATION = settings.get("UNLOCK_DURATION", 15)
+WATCHDOG_TIMEOUT = settings.get("WATCHDOG_TIMEOUT", 5)
+
+locks = LockController(relock_after=UNLOCK_DURATION,
+                       watchdog_timeout=WATCHDOG_TIMEOUT)
+
+def add_door(door, pin):
+    """Register a door's lock pin and drive it locked."""
+    locks.add_door(door, pin)
+
+def unlock_door(door=DEFAULT_DOOR, duration=None):
+    """Unlock a door; it locks again after duration (UNLOCK_DURATION) seconds."""
+    locks.unlock(door, duration)
+
+def lock_door(door=DEFAULT_DOOR):
+    locks.lock_door(door)
+
+def log_auto_locks(logger):
+    """Write an AUTO_LOCK row to logger whenever a door relocks on its own."""
+    def on_lock(door, unlocked, reason):
+        # The lock controller relocks on its own timer (or its watchdog).
+        if reason in ("auto", "watchdog"):
+            logger.log_event("System", "AUTO_LOCK")
+    return locks.subscribe(on_lock)
+
+
+
+DATASET_DIR = settings.get("DATASET_DIR", "faces")
+os.makedirs(DATASET_DIR, exist_ok=True)
 
+# Visitor log rows older than this are deleted (0 keeps them forever).
+LOG_RETENTION_DAYS = settings.get("LOG_RETENTION_DAYS", 30)
 
-try:
-    import RPi.GPIO as GPIO
-except ModuleNotFoundError:
-    class GPIO:
-        BCM = OUT = None
-        HIGH = 1
-        LOW = 0
-        def setmode(x): pass
-        def setup(pin, mode): pass
-        def output(pin, value):
-            print(f"[LOCK] {'UNLOCKED' if value else 'LOCKED'}")
-        def cleanup(): pass
+# Cascades, detector, recognizer and camera are all created on first use
+# (or by prewarm()), so importing this module stays cheap.
+face_cascade = LazyResource(lambda: cv2.CascadeClassifier(
+    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+))
+eye_cascade = LazyResource(lambda: cv2.CascadeClassifier(
+    cv2.data.haarcascades + "haarcascade_eye.xml"
+))
+# Backends are picked by name from backends.py. "haar" detects on a ~400px
+# wide copy of the frame, "yunet" uses OpenCV's DNN detector. Recognizers:
+# "lbph" (OpenCV), "gallery" (batched NumPy LBPH with identical distances)
+# or "sface" (DNN embeddings with cosine search, which needs "yunet": its
+# faces are aligned on YuNet's landmarks in the color frame). Face crops
+# for recognition are always cut from the full-resolution image.
+DETECTOR_BACKEND = settings.get("DETECTOR_BACKEND", "haar")
+RECOGNIZER_BACKEND = settings.get("RECOGNIZER_BACKEND", "lbph")
+# detectMultiScale parameters for the "haar" detector.
+DETECT_SCALE_FACTOR = settings.get("DETECT_SCALE_FACTOR", 1.2)
+DETECT_MIN_NEIGHBORS = settings.get("DETECT_MIN_NEIGHBORS", 4)
+
+def tune_detector(created):
+    if hasattr(created, "scale_factor"):
+        created.scale_factor = DETECT_SCALE_FACTOR
+        created.min_neighbors = DETECT_MIN_NEIGHBORS
+    return created
+
+detector = LazyResource(
+    lambda: tune_detector(backends.create_detector(DETECTOR_BACKEND,
+                                                   face_cascade.get))
+)
 
-LOCK_PIN = 18
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(LOCK_PIN, GPIO.OUT)
-GPIO.output(LOCK_PIN, GPIO.LOW)
+def create_recognizer():
+    return backends.create_recognizer(RECOGNIZER_BACKEND)
+
+recognizer = None       # set by load_model() / train_model()
+
+# Frames are pulled from a background reader so every decision is made on
+# the newest frame rather than whatever is queued in the driver buffer. The
+# camera opens on the first read, closes after CAMERA_IDLE_TIMEOUT seconds
+# without one, and is reopened with backoff if the device fails.
+CAMERA_SOURCE = settings.get("CAMERA_SOURCE", 0)
+CAMERA_IDLE_TIMEOUT = settings.get("CAMERA_IDLE_TIMEOUT", 60)
+grabber = ManagedCamera(CAMERA_SOURCE, idle_timeout=CAMERA_IDLE_TIMEOUT)
+
+# Per-stage timings and counters (see metrics.py). Off unless the METRICS
+# setting is on (e.g. FACE_METRICS=1); when on, a snapshot is written to
+# METRICS_FILE every METRICS_INTERVAL seconds (".prom" for Prometheus text,
+# ".jsonl" to append JSON lines) and METRICS_OVERLAY draws FPS and
+# latencies on the preview.
+METRICS_ENABLED = settings.get("METRICS", False)
+METRICS_FILE = settings.get("METRICS_FILE", "metrics.prom")
+METRICS_INTERVAL = settings.get("METRICS_INTERVAL", 10)
+METRICS_OVERLAY = True
+
+metrics.enabled = METRICS_ENABLED
+metrics.collect(lambda: {"frames_captured": grabber.frames_captured,
+                         "dropped_frames": grabber.frames_dropped})
+
+# Scans publish "granted", "denied" and "stranger" events with snapshots
+# on `events` (see events.py); sinks run on their own worker threads, so
+# nothing here waits on disk or network. Snapshots are kept in SNAPSHOT_DIR
+# up to SNAPSHOT_MAX_MB; with WEBHOOK_URL set, deny and stranger events are
+# also POSTed there. More sinks (EmailNotifier, LogSink) can be subscribed
+# with events.subscribe(). The built-in sinks are subscribed by setup().
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_MAX_MB = settings.get("SNAPSHOT_MAX_MB", 200)
+WEBHOOK_URL = settings.get("WEBHOOK_URL", None)
+
+events = EventBus()
+
+# verify_face runs the cascade every DETECT_EVERY frames and tracks the
+# boxes in between; set it to 1 to detect on every frame.
+DETECT_EVERY = settings.get("DETECT_EVERY", 5)
+# Distance below which a prediction counts as a match; None uses the
+# recognizer backend's default (70 for LBPH).
+CONFIDENCE_THRESHOLD = settings.get("CONFIDENCE_THRESHOLD", None)
+# Decisions combine several frames (see decision.py). A tracked face is
+# re-predicted every REPREDICT_EVERY frames and each new prediction is one
+# vote: GRANT_VOTES matches among the last VOTE_WINDOW votes grant access,
+# DENY_VOTES misses deny it before the scan window runs out. Frames with
+# no face are not recognized at all.
+REPREDICT_EVERY = settings.get("REPREDICT_EVERY", 2)
+VOTE_WINDOW = settings.get("VOTE_WINDOW", 12)
+GRANT_VOTES = settings.get("GRANT_VOTES", 3)
+DENY_VOTES = settings.get("DENY_VOTES", 12)
+# Liveness (blink, micro-motion and screen/print texture, see liveness.py)
+# starts on a face once it first matches and must pass before the door
+# unlocks, so scans of unknown faces never pay for it.
+LIVENESS = settings.get("LIVENESS", True)
+# Seconds verify_face scans and then shows its result; seconds the door
+# daemon and cameras.py give a visitor to be recognized.
+VERIFY_SCAN_WINDOW = settings.get("VERIFY_SCAN_WINDOW", 5)
+RESULT_HOLD = settings.get("RESULT_HOLD", 5)
+DOOR_SCAN_WINDOW = settings.get("DOOR_SCAN_WINDOW", 8)
+
+# Failed scans and logins are throttled (see ratelimit.py): ATTEMPT_LIMIT
+# failures within ATTEMPT_WINDOW seconds lock the user out for LOCKOUT
+# seconds, doubling with every further lockout up to MAX_LOCKOUT. A scan
+# fails when it sees a face that does not match. A throttled attempt is
+# refused before the camera or model is touched. Lockouts are kept in
+# ATTEMPTS_FILE across restarts.
+ATTEMPTS_FILE = "attempts.json"
+ATTEMPT_LIMIT = settings.get("ATTEMPT_LIMIT", 3)
+ATTEMPT_WINDOW = settings.get("ATTEMPT_WINDOW", 60)
+LOCKOUT = settings.get("LOCKOUT", 60)
+MAX_LOCKOUT = settings.get("MAX_LOCKOUT", 3600)
+
+attempts = AttemptLimiter(ATTEMPTS_FILE, ATTEMPT_LIMIT, ATTEMPT_WINDOW,
+                          LOCKOUT, MAX_LOCKOUT)
+# Scans that see no face at all (a passer-by, a shadow, a stuck motion
+# trigger) never lock anyone out; they are only capped at EMPTY_SCAN_LIMIT
+# per EMPTY_SCAN_WINDOW seconds, with a flat wait that does not grow.
+EMPTY_SCAN_LIMIT = settings.get("EMPTY_SCAN_LIMIT", 3)
+EMPTY_SCAN_WINDOW = settings.get("EMPTY_SCAN_WINDOW", 60)
+
+empty_scans = AttemptLimiter(None, EMPTY_SCAN_LIMIT, EMPTY_SCAN_WINDOW,
+                             EMPTY_SCAN_WINDOW, EMPTY_SCAN_WINDOW)
+# The camera itself only gets a flat ATTEMPT_WINDOW wait after ATTEMPT_LIMIT
+# unmatched faces: every visitor who is not enrolled fails a scan, so a
+# growing lockout there would shut the residents out after a few deliveries.
+camera_attempts = AttemptLimiter(None, ATTEMPT_LIMIT, ATTEMPT_WINDOW,
+                                 ATTEMPT_WINDOW, ATTEMPT_WINDOW)
+
+
+def _scan_retry_after(username=None):
+    """Seconds until a scan (for username, if given) may run; 0 if now."""
+    camera_key = f"camera:{DEFAULT_DOOR}"
+    user_keys = (f"scan:{username}",) if username else ()
+    return max(attempts.retry_after(*user_keys),
+               camera_attempts.retry_after(camera_key),
+               empty_scans.retry_after(camera_key, *user_keys))
+
+
+def _record_scan(granted, saw_face, username=None):
+    """Count one finished scan against the user and camera limiters."""
+    camera_key = f"camera:{DEFAULT_DOOR}"
+    user_keys = (f"scan:{username}",) if username else ()
+    if granted or saw_face:
+        attempts.record(granted, *user_keys)
+        camera_attempts.record(granted, camera_key)
+    if granted or not saw_face:
+        empty_scans.record(granted, camera_key, *user_keys)
+
+# Passwords are hashed with salted scrypt (see credentials.py). Its cost is
+# calibrated on first use to take about PASSWORD_HASH_SECONDS on this
+# machine and kept in PASSWORD_COST_FILE; older SHA-256 hashes are
+# replaced on the next successful login.
+PASSWORD_COST_FILE = "password_cost.json"
+PASSWORD_HASH_SECONDS = settings.get("PASSWORD_HASH_SECONDS", 0.25)
+
+password_cost = LazyResource(
+    lambda: credentials.load_cost(PASSWORD_COST_FILE, PASSWORD_HASH_SECONDS)
+)
+# Checked when the username is unknown, so such logins take as long as
+# real ones.
+_dummy_hash = LazyResource(
+    lambda: credentials.hash_password("", password_cost.get())
+)
 
-door_unlocked = False
+# Trained model and its manifest are persisted next to the dataset so
+# verify_face can reuse them instead of retraining on every unlock.
+MODEL_MANIFEST = "model_manifest.json"
+
+# Enrollment stores ENROLL_SAMPLES preprocessed crops per person as one
+# uint8 array (N x FACE_SIZE) in FACE_CACHE; older enrollments may still
+# have a single raw face.jpg instead. Backends that take aligned color
+# faces (SFace) also get them in ALIGNED_CACHE next to it.
+FACE_CACHE = "faces.npy"
+ALIGNED_CACHE = "faces_aligned.npy"
+LEGACY_FACE = "face.jpg"
+FACE_SIZE = (100, 100)
+ENROLL_SAMPLES = 5
+STABLE_FRAMES = 5       # frames a face must hold still before auto-capture
+CAPTURE_GAP = 0.4       # seconds between auto-captured samples
+# New enrollments closer than this to someone already enrolled trigger a
+# duplicate warning; None uses the match threshold.
+DUPLICATE_THRESHOLD = settings.get("DUPLICATE_THRESHOLD", None)
+
+_label_map = None       # label -> account_name for the model in memory
+_model_samples = {}     # face path (relative to DATASET_DIR) -> sample info
+_next_label = 0
+_model_version = 0      # bumped whenever the model in memory changes
+_gallery = None         # (model version, LBPHGallery), see _batch_index()
+# The model is shared by scans, enrollment and prewarm. _model_lock is held
+# around every prediction and every change to the model in memory;
+# _train_lock lets one load or (re)train run at a time. Retrains build a
+# new recognizer and swap it in, so scans are not held up while they run.
+_model_lock = threading.RLock()
+_train_lock = threading.RLock()
+_roster = None
+
+
+def _apply_settings(changes):
+    """Make live config changes take effect without reopening the camera
+    or reloading the model; scans already running keep their settings."""
+    globals().update(changes)
+    locks.relock_after = UNLOCK_DURATION
+    locks.watchdog_timeout = WATCHDOG_TIMEOUT
+    grabber.idle_timeout = CAMERA_IDLE_TIMEOUT
+    if detector.loaded:
+        tune_detector(detector.get())
+
+settings.validate()
+settings.subscribe(_apply_settings)
+
+
+_started = False
+
+def _shutdown(logger):
+    """Deliver the queued events (LogSink rows among them), then close logger."""
+    events.close()
+    logger.close()
+
+def setup(default_door=True, logger=None):
+    """Start the door unit: lock DEFAULT_DOOR on LOCK_PIN, watch the config
+    file, export metrics and subscribe the snapshot and webhook sinks.
+
+    Only programs that run a door call this (auth_ui, door_daemon and
+    cameras, which registers its own doors with default_door=False).
+    Importing this module, as the roster tools and the camera pool's
+    workers do, never touches the locks or starts a thread. Pass the
+    program's logger once it exists: at exit the event bus is drained into
+    it before it closes.
+    """
+    global _started
+    if default_door:
+        add_door(DEFAULT_DOOR, LOCK_PIN)
+    if logger is not None:
+        # Registered after the logger's own close, so this runs first.
+        atexit.register(_shutdown, logger)
+    if _started:
+        return
+    _started = True
+    settings.watch(CONFIG_RELOAD_INTERVAL)
+    if METRICS_ENABLED:
+        metrics.start_exporter(METRICS_FILE, METRICS_INTERVAL)
+    events.subscribe(SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_MAX_MB * 1024 * 1024))
+    if WEBHOOK_URL:
+        events.subscribe(WebhookNotifier(WEBHOOK_URL))
 
-def unlock_door():
-    global door_unlocked
-    if not door_unlocked:
-        GPIO.output(LOCK_PIN, GPIO.HIGH)
-        door_unlocked = True
 
-def lock_door():
-    global door_unlocked
-    GPIO.output(LOCK_PIN, GPIO.LOW)
-    door_unlocked = False
 
+def hash_password(password):
+    return credentials.hash_password(password, password_cost.get())
 
+def verify_password(password, hashed):
+    return credentials.verify_password(password, hashed)
 
-DATASET_DIR = "faces"
-os.makedirs(DATASET_DIR, exist_ok=True)
 
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-)
 
-recognizer = cv2.face.LBPHFaceRecognizer_create()
-cap = cv2.VideoCapture(0)
+def roster():
+    """The roster index (see roster.py) for the current DATASET_DIR."""
+    global _roster
+    if _roster is None or _roster.dataset_dir != DATASET_DIR:
+        _roster = Roster(DATASET_DIR, (FACE_CACHE, LEGACY_FACE))
+    return _roster
 
 
+def create_account(username, password, first_name, last_name,
+                   confirm_duplicate=None):
+    roster().put_account(username, hash_password(password),
+                         f"{first_name} {last_name}")
+    return update_face(username, confirm_duplicate)
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
 
-def verify_password(password, hashed):
-    return hash_password(password) == hashed
+def align_face(face):
+    """Rotate a gray face crop so the eyes are level, if both are found."""
+    h, w = face.shape[:2]
+    eyes = eye_cascade.get().detectMultiScale(
+        face[:h // 2], 1.1, 5, minSize=(max(1, w // 10), max(1, w // 10))
+    )
+    if len(eyes) < 2:
+        return face
+
+    eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+    (lx, ly), (rx, ry) = sorted(
+        (ex + ew / 2.0, ey + eh / 2.0) for (ex, ey, ew, eh) in eyes
+    )
+    angle = np.degrees(np.arctan2(ry - ly, rx - lx))
+    if abs(angle) > 30:
+        return face     # implausible pair, likely a false eye detection
+    rotation = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    return cv2.warpAffine(face, rotation, (w, h), borderMode=cv2.BORDER_REPLICATE)
+
+
+def preprocess_face(face):
+    """Normalize a gray face crop: align, resize to FACE_SIZE, equalize."""
+    face = cv2.resize(align_face(face), FACE_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.equalizeHist(face)
+
+
+def match_threshold():
+    if CONFIDENCE_THRESHOLD is not None:
+        return CONFIDENCE_THRESHOLD
+    return backends.RECOGNIZERS[RECOGNIZER_BACKEND][2]
+
+
+def aligned_input():
+    return backends.aligned_input(RECOGNIZER_BACKEND)
+
+
+def _aligner():
+    global recognizer
+    with _model_lock:
+        if recognizer is None:
+            recognizer = create_recognizer()
+        return recognizer
+
 
+def face_input(frame, gray, box, landmarks=None):
+    """The recognizer's input for one face: its gray crop or, for backends
+    that take aligned color faces, the frame aligned on the landmarks."""
+    if landmarks is not None and aligned_input():
+        return _aligner().align(frame, landmarks)
+    x, y, w, h = box
+    return gray[y:y+h, x:x+w]
 
 
-def create_account(username, password, first_name, last_name):
-    user_dir = os.path.join(DATASET_DIR, username)
-    os.makedirs(user_dir, exist_ok=True)
+def _prepare(face):
+    # Aligned color faces are ready as they are; gray crops are normalized.
+    return face if face.ndim == 3 else preprocess_face(face)
 
-    with open(os.path.join(user_dir, "password.txt"), "w") as f:
-        f.write(hash_password(password))
 
-    with open(os.path.join(user_dir, "info.txt"), "w") as f:
-        f.write(f"{first_name} {last_name}")
+def detect_faces(gray, previous=()):
+    with metrics.stage("detect"):
+        faces = detector.get().detect(gray, previous)
+    metrics.count("faces_detected", len(faces))
+    return faces
 
-    return update_face(username)
 
+def predict_faces(faces):
+    """Predict several face crops, in one gallery pass when supported."""
+    with metrics.stage("preprocess"):
+        faces = [_prepare(face) for face in faces]
+    with metrics.stage("predict"), _model_lock:
+        if hasattr(recognizer, "predict_batch"):
+            results = [top[0] if top else (-1, float("inf"))
+                       for top in recognizer.predict_batch(faces)]
+        else:
+            results = [recognizer.predict(face) for face in faces]
+    metrics.count("predictions", len(results))
+    return results
 
-def capture_face(face_path, window_title, instruction):
-    while True:
-        ret, frame = cap.read()
+
+def show_frame(window_title, frame):
+    """Display a preview frame and return the key pressed, if any."""
+    if METRICS_OVERLAY:
+        metrics.draw_overlay(frame)
+    with metrics.stage("imshow"):
+        cv2.imshow(window_title, frame)
+        return cv2.waitKey(1) & 0xFF
+
+
+def save_face_samples(face_dir, samples, aligned=None):
+    """Write preprocessed samples (and aligned faces, if given) to face_dir's
+    caches, replacing face.jpg."""
+    aligned_path = os.path.join(face_dir, ALIGNED_CACHE)
+    if aligned:
+        tmp_path = aligned_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.stack(aligned).astype(np.uint8))
+        os.replace(tmp_path, aligned_path)
+    elif os.path.exists(aligned_path):
+        os.remove(aligned_path)     # from an older capture of someone else
+
+    cache_path = os.path.join(face_dir, FACE_CACHE)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.stack(samples).astype(np.uint8))
+    os.replace(tmp_path, cache_path)
+
+    legacy_path = os.path.join(face_dir, LEGACY_FACE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+    return cache_path
+
+
+def load_face_samples(path):
+    """Return the preprocessed samples stored at a cache or legacy image path."""
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    return preprocess_face(img)[np.newaxis]
+
+
+def recognizer_samples(path):
+    """The samples at path in the form the recognizer takes: the aligned
+    faces next to it when the backend wants those and they exist."""
+    if aligned_input():
+        aligned_path = os.path.join(os.path.dirname(path), ALIGNED_CACHE)
+        if os.path.exists(aligned_path):
+            return np.load(aligned_path, mmap_mode="r")
+    return load_face_samples(path)
+
+
+def capture_face(face_dir, window_title, instruction, samples=ENROLL_SAMPLES,
+                 accept=None):
+    """Collect several face samples, auto-capturing whenever a face holds still.
+
+    ENTER captures a sample immediately. Returns True once all samples are
+    saved to face_dir, False if cancelled with Q, the camera fails, or
+    accept(samples) rejects the capture. accept gets the samples in the
+    form the recognizer takes (see recognizer_samples).
+    """
+    captured = []
+    aligned = []
+    previous_box = None
+    landmarks = None
+    stable = 0
+    last_capture = 0.0
+
+    while len(captured) < samples:
+        ret, frame = grabber.read()
         if not ret:
             break
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.2, 4)
+        metrics.mark_frame()
+        with metrics.stage("cvt_color"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = detect_faces(gray)
 
         cv2.putText(frame, instruction,
                     (20, 40), cv2.FONT_HERSHEY_SIMPLEX,
                     0.8, (0, 255, 0), 2)
+        cv2.putText(frame,
+                    f"Captured {len(captured)}/{samples} - hold still, "
+                    "then turn slightly left/right",
+                    (20, 80), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7, (0, 255, 255), 2)
 
         for (x, y, w, h) in faces:
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
 
-        cv2.imshow(window_title, frame)
-        key = cv2.waitKey(1) & 0xFF
+        if len(faces) > 0:
+            box = tuple(int(v) for v in faces[0])
+            if previous_box is not None and box_iou(box, previous_box) > 0.8:
+                stable += 1
+            else:
+                stable = 0
+            previous_box = box
+            landmarks = getattr(faces[0], "landmarks", None)
+        else:
+            previous_box = None
+            stable = 0
 
-        if key == 13 and len(faces) > 0:
-            x, y, w, h = faces[0]
-            face = gray[y:y+h, x:x+w]
-            cv2.imwrite(face_path, face)
-            cv2.destroyAllWindows()
-            return True
+        key = show_frame(window_title, frame)
 
         if key == ord("q"):
             break
 
+        now = time.time()
+        auto = stable >= STABLE_FRAMES and (now - last_capture) >= CAPTURE_GAP
+        if previous_box is not None and (key == 13 or auto):
+            x, y, w, h = previous_box
+            captured.append(preprocess_face(gray[y:y+h, x:x+w]))
+            if landmarks is not None and aligned_input():
+                aligned.append(face_input(frame, gray, previous_box, landmarks))
+            last_capture = now
+            stable = 0
+
     cv2.destroyAllWindows()
-    return False
+    if len(captured) < samples:
+        return False
+    if len(aligned) < len(captured):
+        aligned = None
+    if accept is not None and not accept(aligned or captured):
+        return False
 
+    save_face_samples(face_dir, captured, aligned)
+    return True
 
 
-def update_face(username):
-    user_dir = os.path.join(DATASET_DIR, username)
-    face_path = os.path.join(user_dir, "face.jpg")
+def duplicate_threshold():
+    if DUPLICATE_THRESHOLD is not None:
+        return DUPLICATE_THRESHOLD
+    return match_threshold()
 
-    if not os.path.exists(user_dir):
-        return False
-    return capture_face(
-        face_path,
-        "Face Capture",
-        "Press ENTER to capture face (Q to cancel)"
+
+def _batch_index():
+    """The model as something with predict_batch(faces, k) (_model_lock held).
+
+    That is the recognizer itself, or, for OpenCV's LBPH, which only has a
+    top-1 predict(), an LBPHGallery of the same samples (identical
+    distances), built once per model version.
+    """
+    global _gallery
+    if hasattr(recognizer, "predict_batch"):
+        return recognizer
+    if _gallery is None or _gallery[0] != _model_version:
+        faces, labels = [], []
+        for rel, info in _model_samples.items():
+            images = recognizer_samples(os.path.join(DATASET_DIR, rel))
+            if images is None or not len(images):
+                continue
+            faces.extend(images)
+            labels.extend([info["label"]] * len(images))
+        gallery = LBPHGallery()
+        gallery.train(faces, labels)
+        _gallery = (_model_version, gallery)
+    return _gallery[1]
+
+
+def find_duplicates(samples, exclude_dir=None, k=3):
+    """Enrolled people whose faces are close to the given preprocessed samples.
+
+    All samples are scored against the whole gallery in one predict_batch
+    call, keeping each sample's k closest people, so the person being
+    re-enrolled cannot hide everyone else. Returns dicts with "person" (the
+    person's directory relative to DATASET_DIR), "account" and the best
+    "distance", closest first; exclude_dir (the person being re-enrolled)
+    is skipped.
+    """
+    if not ensure_model():
+        return []
+    threshold = duplicate_threshold()
+    exclude = os.path.relpath(exclude_dir, DATASET_DIR) if exclude_dir else None
+
+    with _model_lock:
+        people = {info["label"]: (os.path.dirname(rel), info["account"])
+                  for rel, info in _model_samples.items()}
+        results = _batch_index().predict_batch(list(samples), k)
+
+    closest = {}
+    for top in results:
+        for label, distance in top:
+            if label not in people or people[label][0] == exclude:
+                continue
+            if distance < threshold and distance < closest.get(label, float("inf")):
+                closest[label] = distance
+    return sorted(
+        ({"person": people[label][0], "account": people[label][1],
+          "distance": distance} for label, distance in closest.items()),
+        key=lambda match: match["distance"]
+    )
+
+
+def audit_roster(threshold=None, k=5, chunk=256):
+    """Find pairs of enrolled people whose faces are near-duplicates.
+
+    Every stored sample is queried against the whole gallery, chunk
+    samples per predict_batch call, instead of one predict() per pair of
+    people (see _batch_index for the OpenCV LBPH backend). Returns dicts
+    with "people" and "accounts" (one pair each) and the closest
+    "distance", closest first.
+    """
+    if not ensure_model():
+        return []
+    if threshold is None:
+        threshold = duplicate_threshold()
+
+    with _model_lock:
+        faces, labels, people = [], [], {}
+        for rel, info in _model_samples.items():
+            images = recognizer_samples(os.path.join(DATASET_DIR, rel))
+            if images is None or not len(images):
+                continue
+            faces.extend(images)
+            labels.extend([info["label"]] * len(images))
+            people[info["label"]] = (os.path.dirname(rel), info["account"])
+
+        index = _batch_index()
+        closest = {}
+        for start in range(0, len(faces), chunk):
+            batch = index.predict_batch(faces[start:start + chunk], k)
+            for label, top in zip(labels[start:start + chunk], batch):
+                for other, distance in top:
+                    if other == label or other not in people or distance >= threshold:
+                        continue
+                    pair = (min(label, other), max(label, other))
+                    if distance < closest.get(pair, float("inf")):
+                        closest[pair] = distance
+
+    return sorted(
+        ({"people": (people[a][0], people[b][0]),
+          "accounts": (people[a][1], people[b][1]),
+          "distance": distance} for (a, b), distance in closest.items()),
+        key=lambda pair: pair["distance"]
     )
 
 
-def add_member(account_username, member_name):
-    account_dir = os.path.join(DATASET_DIR, account_username)
-    if not os.path.exists(account_dir):
+def _duplicate_check(face_dir, confirm_duplicate):
+    """accept() for capture_face: ask confirm_duplicate(matches) on a match."""
+    if confirm_duplicate is None:
+        return None
+
+    def accept(samples):
+        matches = find_duplicates(samples, exclude_dir=face_dir)
+        return not matches or confirm_duplicate(matches)
+    return accept
+
+
+
+def update_face(username, confirm_duplicate=None):
+    if roster().account(username) is None:
         return False
+    user_dir = roster().person_dir(username)
+    captured = capture_face(
+        user_dir,
+        "Face Capture",
+        "Look at the camera; ENTER captures manually (Q to cancel)",
+        accept=_duplicate_check(user_dir, confirm_duplicate)
+    )
+    if captured:
+        roster().set_sample(username, None, FACE_CACHE)
+        refresh_model(os.path.join(user_dir, FACE_CACHE), username)
+    return captured
 
-    members_dir = os.path.join(account_dir, "members")
-    os.makedirs(members_dir, exist_ok=True)
 
-    member_dir = os.path.join(members_dir, member_name)
-    if os.path.exists(member_dir):
+def add_member(account_username, member_name, confirm_duplicate=None,
+               role="member"):
+    if (roster().account(account_username) is None
+            or roster().person(account_username, member_name) is not None):
         return False
 
+    member_dir = roster().person_dir(account_username, member_name)
     os.makedirs(member_dir, exist_ok=True)
-    face_path = os.path.join(member_dir, "face.jpg")
 
-    return capture_face(
-        face_path,
+    captured = capture_face(
+        member_dir,
         "Add Member Face",
-        "Press ENTER to capture member face (Q to cancel)"
+        "Member looks at the camera; ENTER captures manually (Q to cancel)",
+        accept=_duplicate_check(member_dir, confirm_duplicate)
     )
+    if captured:
+        roster().put_person(account_username, member_name, role, FACE_CACHE)
+        refresh_model(os.path.join(member_dir, FACE_CACHE), account_username)
+    else:
+        shutil.rmtree(member_dir, ignore_errors=True)
+    return captured
 
 
 
 def delete_account(username):
-    user_dir = os.path.join(DATASET_DIR, username)
-
-    if os.path.exists(user_dir):
-        shutil.rmtree(user_dir)
+    if roster().account(username) is not None:
+        # Unindex first: a crash mid-delete must not leave a usable login.
+        roster().remove_account(username)
+        shutil.rmtree(roster().person_dir(username), ignore_errors=True)
+        # LBPH cannot forget samples, so drop them with a full retrain.
+        if any(s["account"] == username for s in _model_samples.values()):
+            train_model()
         return True
 
     return False
 
 
 
-def train_model():
-    faces, labels = [], []
-    label_map = {}
-    label = 0
-
-    for account_name in os.listdir(DATASET_DIR):
-        account_dir = os.path.join(DATASET_DIR, account_name)
-        if not os.path.isdir(account_dir):
-            continue
-
-        img_path = os.path.join(account_dir, "face.jpg")
-        if os.path.exists(img_path):
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is not None:
-                faces.append(img)
-                labels.append(label)
-                label_map[label] = account_name
-                label += 1
-
-        members_dir = os.path.join(account_dir, "members")
-        if not os.path.isdir(members_dir):
-            continue
-
-        for member_name in os.listdir(members_dir):
-            member_dir = os.path.join(members_dir, member_name)
-            if not os.path.isdir(member_dir):
-                continue
+def face_samples():
+    """[(sample path, account name)] for every enrolled person, from the roster."""
+    return roster().samples()
 
-            member_face = os.path.join(member_dir, "face.jpg")
-            if not os.path.exists(member_face):
-                continue
 
-            img = cv2.imread(member_face, cv2.IMREAD_GRAYSCALE)
-            if img is None:
+def _sample_stat(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _model_paths():
+    model_file = backends.RECOGNIZERS[RECOGNIZER_BACKEND][1]
+    return (os.path.join(DATASET_DIR, model_file),
+            os.path.join(DATASET_DIR, MODEL_MANIFEST))
+
+
+def save_model():
+    model_path, manifest_path = _model_paths()
+    # Both files are replaced whole, model first, so a reader (or a crash)
+    # never pairs a manifest with a half-written model.
+    if _model_samples:
+        recognizer.write(model_path + ".tmp")
+        os.replace(model_path + ".tmp", model_path)
+    elif os.path.exists(model_path):
+        os.remove(model_path)
+
+    manifest = {
+        "backend": RECOGNIZER_BACKEND,
+        "next_label": _next_label,
+        "labels": {str(k): v for k, v in _label_map.items()},
+        "samples": _model_samples,
+    }
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def load_model():
+    """Load the persisted model into memory. Returns False if unusable."""
+    global recognizer, _label_map, _model_samples, _next_label, _model_version
+    model_path, manifest_path = _model_paths()
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("backend", "lbph") != RECOGNIZER_BACKEND:
+            return False
+        # read() appends to an already trained LBPH model, so start fresh.
+        loaded = create_recognizer()
+        if manifest["samples"]:
+            loaded.read(model_path)
+    except (OSError, ValueError, KeyError, cv2.error):
+        return False
+
+    with _model_lock:
+        recognizer = loaded
+        _label_map = {int(k): v for k, v in manifest["labels"].items()}
+        _model_samples = manifest["samples"]
+        _next_label = manifest["next_label"]
+        _model_version += 1
+    return True
+
+
+def model_is_stale():
+    """Compare the stored manifest against the face samples on disk."""
+    current = {}
+    for path, account_name in face_samples():
+        current[os.path.relpath(path, DATASET_DIR)] = _sample_stat(path)
+
+    if current.keys() != _model_samples.keys():
+        return True
+    return any(_model_samples[rel]["stat"] != stat
+               for rel, stat in current.items())
+
+
+def train_model():
+    """Retrain from every enrolled face sample and persist the result."""
+    global recognizer, _label_map, _model_samples, _next_label, _model_version
+    with _train_lock:
+        faces, labels = [], []
+        label_map = {}
+        samples = {}
+        # People keep their label across retrains, so a scan that started on
+        # the previous model never takes one person's label for another's.
+        previous = {os.path.dirname(rel): info["label"]
+                    for rel, info in _model_samples.items()}
+        next_label = _next_label
+
+        for path, account_name in face_samples():
+            images = recognizer_samples(path)
+            if images is None or not len(images):
                 continue
 
-            faces.append(img)
-            labels.append(label)
+            rel = os.path.relpath(path, DATASET_DIR)
+            label = previous.get(os.path.dirname(rel))
+            if label is None:
+                label, next_label = next_label, next_label + 1
+            faces.extend(images)
+            labels.extend([label] * len(images))
             label_map[label] = account_name
-            label += 1
-
-    if faces:
-        recognizer.train(faces, np.array(labels))
-        return label_map
-    return None
+            samples[rel] = {
+                "label": label,
+                "account": account_name,
+                "stat": _sample_stat(path),
+            }
+
+        trained = create_recognizer()
+        if faces:
+            with metrics.stage("train_model"):
+                trained.train(faces, np.array(labels, dtype=np.int32))
+
+        with _model_lock:
+            recognizer = trained
+            _label_map, _model_samples, _next_label = label_map, samples, next_label
+            _model_version += 1
+        save_model()
+        return _label_map or None
+
+
+def ensure_model():
+    """Return the label map, loading or retraining only when needed."""
+    with _train_lock:
+        if _label_map is None:
+            if not load_model() or model_is_stale():
+                train_model()
+        return _label_map or None
+
+
+def refresh_model(face_path, account_name):
+    """Fold newly captured face samples into the model without a retrain."""
+    global _next_label, _model_version
+    with _train_lock:
+        if _label_map is None and not load_model():
+            return train_model()
+
+        rel = os.path.relpath(face_path, DATASET_DIR)
+        face_dir = os.path.dirname(rel)
+        images = recognizer_samples(face_path)
+        if images is None or any(os.path.dirname(r) == face_dir for r in _model_samples):
+            # Replacing samples: LBPH keeps the old ones, so retrain.
+            return train_model()
+
+        with _model_lock:
+            label = _next_label
+            recognizer.update(list(images), np.full(len(images), label, dtype=np.int32))
+            _label_map[label] = account_name
+            _model_samples[rel] = {
+                "label": label,
+                "account": account_name,
+                "stat": _sample_stat(face_path),
+            }
+            _next_label += 1
+            _model_version += 1
+        save_model()
+        return _label_map
+
+
+def login_retry_after(username):
+    """Seconds before username may try to log in again (0: now)."""
+    return attempts.retry_after(f"login:{username}")
 
 
 def login(username, password):
-    user_dir = os.path.join(DATASET_DIR, username)
-    pwd_file = os.path.join(user_dir, "password.txt")
+    key = f"login:{username}"
+    if attempts.retry_after(key):
+        metrics.count("throttled")
+        return False
 
-    if not os.path.exists(pwd_file):
+    account = roster().account(username)
+    if account is None or not account["password_hash"]:
+        verify_password(password, _dummy_hash.get())
+        attempts.record(False, key)
         return False
 
-    with open(pwd_file, "r") as f:
-        saved_hash = f.read().strip()
+    saved_hash = account["password_hash"]
+    ok = verify_password(password, saved_hash)
+    attempts.record(ok, key)
+    if ok and credentials.needs_rehash(saved_hash, password_cost.get()):
+        roster().set_password_hash(username, hash_password(password))
+    return ok
 
-    return verify_password(password, saved_hash)
 
+# One worker: scrypt is memory-hard, so logins are hashed one at a time.
+_login_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="login")
 
 
-def verify_face(username):
-    label_map = train_model()
-    if not label_map:
+def login_async(username, password):
+    """Run login() on a worker thread; returns a Future of its result."""
+    return _login_executor.submit(login, username, password)
+
+
+
+def run_verification(username, on_event=None, cancel_event=None, show=True,
+                     scan_window=None, hold=None):
+    """Scan for username's face and unlock the door once enough frames match.
+
+    on_event(event, detail) is called from the scanning thread with one of
+    "scanning", "face_found", "granted", "denied" (a face was seen but not
+    matched, possibly before scan_window ran out), "timeout" (no face was
+    seen), "cancelled" or "throttled" (too many recent failures for this
+    user or camera; detail["retry_after"] is in seconds). Setting
+    cancel_event stops the scan. With show=True the camera preview is
+    displayed and the result is held on screen for hold seconds.
+    scan_window and hold default to VERIFY_SCAN_WINDOW and RESULT_HOLD.
+    """
+    notify = on_event or (lambda event, detail=None: None)
+    scan_window = VERIFY_SCAN_WINDOW if scan_window is None else scan_window
+    hold = RESULT_HOLD if hold is None else hold
+
+    wait = _scan_retry_after(username)
+    if wait:
+        metrics.count("throttled")
+        notify("throttled", {"retry_after": wait})
         return False
 
+    label_map = ensure_model()
     target_labels = {
-        label for label, account_name in label_map.items()
+        label for label, account_name in (label_map or {}).items()
         if account_name == username
     }
 
     if not target_labels:
+        notify("denied", {"reason": "no enrolled face"})
         return False
 
     decision = None
     decision_time = None
+    saw_face = False
+    threshold = match_threshold()
     start_time = time.time()
+    tracker = FaceTracker(detect_faces, detect_every=DETECT_EVERY,
+                          repredict_every=REPREDICT_EVERY)
+    votes = VoteDecision(VOTE_WINDOW, GRANT_VOTES, DENY_VOTES)
+    liveness = None
+    voted_time = None
+    last_face = (None, None)    # newest frame with a face, and its box
+    notify("scanning", {"scan_window": scan_window})
+
+    # The watchdog only covers the frame loop: retraining the model or
+    # opening the camera may legitimately take longer than its timeout.
+    grabber.open()
+    with locks.watching("verify", DEFAULT_DOOR):
+        while True:
+            locks.heartbeat("verify")
+            if cancel_event is not None and cancel_event.is_set():
+                notify("cancelled")
+                break
+
+            ret, frame = grabber.read()
+            if not ret:
+                if decision is None:
+                    notify("timeout", {"reason": "camera unavailable"})
+                break
+
+            metrics.mark_frame()
+            with metrics.stage("cvt_color"):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            fresh = matched = False
+            candidate = None
+            with metrics.stage("track"):
+                tracks = tracker.update(gray)
+            predictions = tracker.predict_all(
+                gray, predict_faces,
+                lambda track: face_input(frame, gray, track.box, track.landmarks)
+            )
+            if tracks:
+                last_face = (frame, tracks[0].box)
+            for track, (label, confidence) in zip(tracks, predictions):
+                if not saw_face:
+                    saw_face = True
+                    notify("face_found", {"box": track.box})
+
+                is_match = label in target_labels and confidence < threshold
+                if is_match and candidate is None:
+                    candidate = track.box
+                if tracker.is_fresh(track):
+                    fresh = True
+                    matched = matched or is_match
+
+            if decision is None and fresh:
+                if votes.vote(matched) == "granted" and voted_time is None:
+                    voted_time = time.time()
+            if decision is None and LIVENESS and candidate is not None:
+                if liveness is None:
+                    liveness = LivenessCheck(eye_cascade.get())
+                x, y, w, h = candidate
+                with metrics.stage("liveness"):
+                    liveness.update(gray[y:y+h, x:x+w])
+            live = liveness.verdict if liveness is not None else None
+
+            if (decision is None and votes.decision == "granted"
+                    and (live or not LIVENESS)):
+                decision = "granted"
+                decision_time = time.time()
+                unlock_door()
+                grabber.note_decision()
+                metrics.count("grants")
+                _record_scan(True, True, username)
+                detail = {"elapsed": decision_time - start_time,
+                          "matches": votes.matches}
+                if liveness is not None:
+                    detail["liveness"] = liveness.signals()
+                    detail["liveness_wait"] = decision_time - voted_time
+                notify("granted", detail)
+                events.publish("granted", username, frame=frame, box=candidate, **detail)
+            elif decision is None and (votes.decision == "denied" or live is False
+                                       or (time.time() - start_time) >= scan_window):
+                decision = "denied"
+                decision_time = time.time()
+                if saw_face:
+                    lock_door()     # a face that did not match: lock if open
+                grabber.note_decision()
+                metrics.count("denials" if saw_face else "timeouts")
+                _record_scan(False, saw_face, username)
+                detail = {"elapsed": decision_time - start_time,
+                          "matches": votes.matches}
+                if live is False:
+                    detail["reason"] = "liveness"
+                    detail["liveness"] = liveness.signals()
+                notify("denied" if saw_face else "timeout", detail)
+                if saw_face:
+                    events.publish("denied", username, frame=last_face[0],
+                                   box=last_face[1], **detail)
+
+            if show:
+                for track in tracks:
+                    x, y, w, h = track.box
+                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                cv2.putText(frame, "Press Q to Close",
+                            (1650, 40), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.8, (0, 255, 0), 2)
+
+                if decision == "granted":
+                    cv2.putText(frame, "Face verified - door unlocked", (20, 40),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                elif decision == "denied":
+                    cv2.putText(frame, "Face not recognized", (20, 40),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+
+                if show_frame("Verify Face to Unlock", frame) == ord("q"):
+                    break
+
+            if decision is not None and (time.time() - decision_time) >= hold:
+                if show:
+                    cv2.destroyAllWindows()
+                return decision == "granted"
+
+    if show:
+        cv2.destroyAllWindows()
+    return decision == "granted"
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.2, 4)
+def verify_face(username):
+    return run_verification(username)
 
-        matched = False
-        for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            face = gray[y:y+h, x:x+w]
-            label, confidence = recognizer.predict(face)
 
-            if label in target_labels and confidence < 70:
-                matched = True
+class VerifyTask:
+    """Handle for a verification running on the background executor."""
 
-        cv2.putText(frame, "Press Q to Close",
-                    (1650, 40), cv2.FONT_HERSHEY_SIMPLEX,
-                    0.8, (0, 255, 0), 2)
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        self.future = None
 
-        if decision is None and matched:
-            decision = "granted"
-            decision_time = time.time()
-            unlock_door()
-        elif decision is None and (time.time() - start_time) >= 5:
-            decision = "denied"
-            decision_time = time.time()
-
-        if decision == "granted":
-            cv2.putText(frame, "Face verified - door unlocked", (20, 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-        elif decision == "denied":
-            cv2.putText(frame, "Face not recognized", (20, 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-        cv2.imshow("Verify Face to Unlock", frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+    def cancel(self):
+        self.cancel_event.set()
 
-        if decision is not None and (time.time() - decision_time) >= 5:
-            cv2.destroyAllWindows()
-            return decision == "granted"
+    def done(self):
+        return self.future.done()
 
-    cv2.destroyAllWindows()
-    return False
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+# One worker: scans share the camera, so they run one at a time.
+_verify_executor = ThreadPoolExecutor(max_workers=1,
+                                      thread_name_prefix="verify")
+
+
+def verify_face_async(username, on_event=None):
+    """Run a headless verification on a worker thread.
+
+    Returns a VerifyTask whose future resolves to True if access was
+    granted. on_event is called from the worker thread, so UI code must
+    hand the events back to its own thread.
+    """
+    task = VerifyTask()
+    task.future = _verify_executor.submit(
+        run_verification, username, on_event, task.cancel_event,
+        show=False, hold=0
+    )
+    return task
+
+
+def prewarm():
+    """Build the detector and model and open the camera in the background.
+
+    Meant to be called once the UI is up. It runs on the verification
+    worker, so it never overlaps a scan; returns the Future.
+    """
+    def warm():
+        detector.get()
+        eye_cascade.get()
+        password_cost.get()
+        ensure_model()
+        grabber.open()
+    return _verify_executor.submit(warm)
+
+
+def scan_for_face(timeout):
+    """Headless scan for any enrolled face.
+
+    Returns (account_name, saw_face). account_name is the account that won
+    GRANT_VOTES of its last VOTE_WINDOW votes and passed liveness; it is
+    None once a matching face fails liveness, DENY_VOTES of the last
+    VOTE_WINDOW predictions matched nobody, or timeout seconds pass.
+    saw_face tells whether any face was in view at all. While the camera
+    is throttled (see ATTEMPT_LIMIT and EMPTY_SCAN_LIMIT) it returns
+    (None, False) at once.
+    """
+    if _scan_retry_after():
+        metrics.count("throttled")
+        return None, False
+
+    label_map = ensure_model()
+    if not label_map:
+        return None, False
+
+    saw_face = False
+    threshold = match_threshold()
+    start_time = time.time()
+    tracker = FaceTracker(detect_faces, detect_every=DETECT_EVERY,
+                          repredict_every=REPREDICT_EVERY)
+    # One grant-only vote per account, plus one deny-only vote on whether
+    # anyone matched at all.
+    votes = {}
+    misses = VoteDecision(VOTE_WINDOW, VOTE_WINDOW + 1, DENY_VOTES)
+    liveness = {}   # account -> LivenessCheck, started on its first match
+    last_face = (None, None)
+    camera_failed = False
+
+    grabber.open()      # before the watchdog is armed, as in run_verification
+    with locks.watching("scan", DEFAULT_DOOR):
+        while (time.time() - start_time) < timeout:
+            locks.heartbeat("scan")
+            ret, frame = grabber.read()
+            if not ret:
+                camera_failed = True
+                break
+
+            metrics.mark_frame()
+            with metrics.stage("cvt_color"):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            with metrics.stage("track"):
+                tracks = tracker.update(gray)
+            predictions = tracker.predict_all(
+                gray, predict_faces,
+                lambda track: face_input(frame, gray, track.box, track.landmarks)
+            )
+            fresh = [prediction for track, prediction in zip(tracks, predictions)
+                     if tracker.is_fresh(track)]
+            if tracks:
+                saw_face = True
+                last_face = (frame, tracks[0].box)
+
+            candidates = {}     # account -> box of a face matching it this frame
+            for track, (label, confidence) in zip(tracks, predictions):
+                if label in label_map and confidence < threshold:
+                    candidates.setdefault(label_map[label], track.box)
+
+            if LIVENESS:
+                for account_name, (x, y, w, h) in candidates.items():
+                    check = liveness.setdefault(account_name,
+                                                LivenessCheck(eye_cascade.get()))
+                    with metrics.stage("liveness"):
+                        check.update(gray[y:y+h, x:x+w])
+                if any(check.verdict is False for check in liveness.values()):
+                    break   # a matching face failed liveness: treat as spoof
+
+            if not fresh:
+                continue
+
+            matched = {label_map[label] for label, confidence in fresh
+                       if label in label_map and confidence < threshold}
+            for account_name in matched | set(votes):
+                account_votes = votes.setdefault(
+                    account_name, VoteDecision(VOTE_WINDOW, GRANT_VOTES, VOTE_WINDOW + 1)
+                )
+                if (account_votes.vote(account_name in matched) == "granted"
+                        and (not LIVENESS or account_name in liveness
+                             and liveness[account_name].verdict)):
+                    grabber.note_decision()
+                    metrics.count("grants")
+                    _record_scan(True, True)
+                    events.publish("granted", account_name, frame=frame,
+                                   box=candidates.get(account_name))
+                    return account_name, True
+            if misses.vote(bool(matched)) == "denied":
+                break
+
+    grabber.note_decision()
+    metrics.count("denials" if saw_face else "timeouts")
+    if saw_face or not camera_failed:
+        # Empty scans are only capped, so a stuck motion trigger cannot
+        # keep the camera loop running.
+        _record_scan(False, saw_face)
+    if saw_face:
+        events.publish("stranger", frame=last_face[0], box=last_face[1])
+    return None, saw_face
 
 def get_full_name(username):
-    info_file = os.path.join(DATASET_DIR, username, "info.txt")
-    if os.path.exists(info_file):
-        with open(info_file, "r") as f:
-            return f.read()
+    account = roster().account(username)
+    if account is not None and account["full_name"] is not None:
+        return account["full_name"]
     return username
@@ -0,0 +1,149 @@
+import numpy as np
+
+
+def lbp_codes(faces, radius=1, neighbors=8):
+    """Extended (circular) LBP codes for a (N, H, W) uint8 batch.
+
+    Follows OpenCV's LBPH sampling, bilinear interpolation and comparison
+    exactly, so distances match cv2.face.LBPHFaceRecognizer and the same
+    thresholds apply.
+    """
+    faces = np.asarray(faces, dtype=np.float32)
+    n, rows, cols = faces.shape
+    h, w = rows - 2 * radius, cols - 2 * radius
+    center = faces[:, radius:radius + h, radius:radius + w]
+    codes = np.zeros((n, h, w), dtype=np.uint8)
+    eps = np.finfo(np.float32).eps
+
+    for bit in range(neighbors):
+        x = radius * np.cos(2.0 * np.pi * bit / neighbors)
+        y = -radius * np.sin(2.0 * np.pi * bit / neighbors)
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        tx, ty = np.float32(x - fx), np.float32(y - fy)
+        shift = lambda dy, dx: faces[:, radius + dy:radius + dy + h,
+                                     radius + dx:radius + dx + w]
+        sample = ((1 - tx) * (1 - ty) * shift(fy, fx) + tx * (1 - ty) * shift(fy, cx)
+                  + (1 - tx) * ty * shift(cy, fx) + tx * ty * shift(cy, cx))
+        codes |= ((sample > center) | (np.abs(sample - center) < eps)
+                  ).astype(np.uint8) << bit
+    return codes
+
+
+def lbp_histograms(faces, grid_x=8, grid_y=8):
+    """Concatenated, per-cell normalized LBP histograms as (N, D) float32."""
+    codes = lbp_codes(faces)
+    n, h, w = codes.shape
+    cell_h, cell_w = h // grid_y, w // grid_x
+    codes = codes[:, :cell_h * grid_y, :cell_w * grid_x]
+
+    # Cell index of every pixel, then one bincount over (face, cell, code).
+    rows = np.arange(cell_h * grid_y) // cell_h
+    cols = np.arange(cell_w * grid_x) // cell_w
+    cells = (rows[:, None] * grid_x + cols[None, :]).astype(np.int64)
+    cell_count = grid_x * grid_y
+    index = (np.arange(n, dtype=np.int64)[:, None, None] * cell_count + cells) * 256
+    index = index + codes
+
+    hist = np.bincount(index.ravel(), minlength=n * cell_count * 256)
+    hist = hist.reshape(n, cell_count * 256).astype(np.float32)
+    return hist / np.float32(cell_h * cell_w)
+
+
+def chi_square(probes, columns, column_sums, chunk=1024):
+    """Chi-square distance between every probe and gallery row, (P, G).
+
+    columns is the gallery stored bin-major, shape (D, G), and column_sums
+    the per-row histogram sums. Uses OpenCV's HISTCMP_CHISQR_ALT,
+    2 * sum((a - b)^2 / (a + b)), rewritten as
+    2 * (sum(a) + sum(b) - 4 * sum(ab / (a + b))). The last term is zero
+    wherever the probe bin is empty, so only the gallery rows of the
+    probe's non-zero bins are read, and those are contiguous.
+    """
+    distances = np.empty((len(probes), columns.shape[1]), dtype=np.float32)
+    for i, probe in enumerate(probes):
+        bins = np.flatnonzero(probe)
+        a = probe[bins][:, None]
+        shared = np.zeros(columns.shape[1], dtype=np.float32)
+        for start in range(0, len(bins), chunk):
+            b = columns[bins[start:start + chunk]]
+            a_part = a[start:start + chunk]
+            shared += (a_part * b / (a_part + b)).sum(axis=0)
+        distances[i] = 2.0 * (a.sum() + column_sums - 4.0 * shared)
+    # The rewritten sum can dip just below zero for identical histograms.
+    return np.maximum(distances, 0.0, out=distances)
+
+
+class LBPHGallery:
+    """LBPH recognizer with a precomputed histogram matrix.
+
+    Drop-in for cv2.face.LBPHFaceRecognizer (train, update, predict, write,
+    read), plus predict_batch() which scores several probes against the
+    whole gallery in one vectorized pass and returns the best k labels with
+    their distances. The histograms are computed once per sample and kept in
+    one contiguous float32 matrix, sorted by label so the best distance per
+    label is a single reduceat over the distance matrix.
+    """
+
+    def __init__(self, grid_x=8, grid_y=8):
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self._set(np.zeros((0, grid_x * grid_y * 256), dtype=np.float32),
+                  np.zeros(0, dtype=np.int32))
+
+    def _set(self, histograms, labels):
+        order = np.argsort(labels, kind="stable")
+        histograms = histograms[order]
+        self.labels = labels[order]
+        # Stored bin-major, (D, G): see chi_square().
+        self.columns = np.ascontiguousarray(histograms.T, dtype=np.float32)
+        self.sums = histograms.sum(axis=1)
+        self.label_ids, self.label_starts = np.unique(self.labels, return_index=True)
+
+    @property
+    def histograms(self):
+        """Gallery histograms as a (G, D) view."""
+        return self.columns.T
+
+    def train(self, faces, labels):
+        self._set(lbp_histograms(faces, self.grid_x, self.grid_y),
+                  np.asarray(labels, dtype=np.int32).ravel())
+
+    def update(self, faces, labels):
+        self._set(
+            np.vstack([self.histograms,
+                       lbp_histograms(faces, self.grid_x, self.grid_y)]),
+            np.concatenate([self.labels,
+                            np.asarray(labels, dtype=np.int32).ravel()])
+        )
+
+    def predict_batch(self, faces, k=1):
+        """Return, per probe, up to k (label, distance) pairs, best first."""
+        if not len(self.labels) or not len(faces):
+            return [[] for _ in faces]
+
+        distances = chi_square(
+            lbp_histograms(faces, self.grid_x, self.grid_y),
+            self.columns, self.sums
+        )
+        per_label = np.minimum.reduceat(distances, self.label_starts, axis=1)
+        k = min(k, per_label.shape[1])
+        top = np.argsort(per_label, axis=1)[:, :k]
+        return [
+            [(int(self.label_ids[j]), float(per_label[i, j])) for j in row]
+            for i, row in enumerate(top)
+        ]
+
+    def predict(self, face):
+        results = self.predict_batch([face], k=1)[0]
+        return results[0] if results else (-1, float("inf"))
+
+    def write(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, histograms=self.histograms, labels=self.labels,
+                     grid=np.array([self.grid_x, self.grid_y]))
+
+    def read(self, path):
+        with np.load(path) as data:
+            self.grid_x, self.grid_y = (int(v) for v in data["grid"])
+            self._set(data["histograms"], data["labels"])
@@ -0,0 +1,147 @@
+"""CPU-cheap liveness signals for a face followed across frames.
+
+LivenessCheck is fed the gray crop of the same face on consecutive frames
+and combines three signals:
+
+- blink: the eye cascade sees open eyes for a couple of frames, loses
+  them for a few frames and then sees them again for a couple of frames;
+- micro-motion: after aligning consecutive crops with phase correlation,
+  what still differs inside the face (expression, eyes, breathing). A
+  photo moved as a whole aligns almost perfectly and leaves only noise;
+- moire: isolated high-frequency peaks in the spectrum of the face's
+  centre, which phone screens and halftone prints produce and skin does
+  not.
+
+The thresholds are starting points; tune them on recorded fixtures with
+benchmarks/liveness.py.
+"""
+import cv2
+import numpy as np
+
+CROP_SIZE = 64
+EYE_SEARCH_WIDTH = 100
+
+
+def moire_score(face, size=CROP_SIZE):
+    """Peak-to-median ratio of the high-frequency spectrum of the face centre.
+
+    Uses native-resolution pixels, since resizing would average the
+    pattern away.
+    """
+    h, w = face.shape[:2]
+    size = min(size, h, w)
+    y0, x0 = (h - size) // 2, (w - size) // 2
+    patch = face[y0:y0 + size, x0:x0 + size].astype(np.float32)
+    patch -= patch.mean()
+    window = np.outer(np.hanning(size), np.hanning(size)).astype(np.float32)
+    spectrum = np.abs(np.fft.fftshift(np.fft.fft2(patch * window)))
+
+    yy, xx = np.mgrid[:size, :size] - size // 2
+    high = spectrum[np.hypot(yy, xx) > size / 4.0]
+    if not high.size:
+        return 0.0
+    return float(high.max() / (np.median(high) + 1e-6))
+
+
+class LivenessCheck:
+    """Accumulates liveness evidence for one face; see the module docstring.
+
+    update() returns True once a blink or enough micro-motion has been
+    seen (and the texture looks like skin), False if the texture looks
+    like a screen or print or max_frames pass without evidence, and None
+    while undecided.
+    """
+
+    def __init__(self, eye_cascade, min_frames=6, max_frames=45,
+                 motion_threshold=1.5, moire_ratio=40.0, max_blink_frames=4):
+        self.eye_cascade = eye_cascade
+        self.min_frames = min_frames
+        self.max_frames = max_frames
+        self.motion_threshold = motion_threshold
+        self.moire_ratio = moire_ratio
+        self.max_blink_frames = max_blink_frames
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.previous = None
+        self.motion = []
+        self.moire = []
+        self.open_run = 0
+        self.open_before = 0    # length of the open run before the closed one
+        self.closed_run = 0
+        self.blinks = 0
+        self.verdict = None
+
+    def _eyes_open(self, face):
+        h, w = face.shape[:2]
+        scale = min(1.0, EYE_SEARCH_WIDTH / float(w))
+        upper = cv2.resize(face[:h // 2], (max(1, round(w * scale)),
+                                           max(1, round(h // 2 * scale))),
+                           interpolation=cv2.INTER_AREA)
+        side = max(1, upper.shape[1] // 10)
+        eyes = self.eye_cascade.detectMultiScale(upper, 1.1, 5,
+                                                 minSize=(side, side))
+        return len(eyes) > 0
+
+    def _update_blink(self, face):
+        # Require two open frames on each side of the closed run, so a
+        # cascade that flickers on a photo does not count as blinking.
+        if self._eyes_open(face):
+            if self.closed_run:
+                short = self.closed_run <= self.max_blink_frames
+                self.open_before = self.open_run if short else 0
+                self.open_run = 0
+                self.closed_run = 0
+            self.open_run += 1
+            if self.open_run == 2 and self.open_before >= 2:
+                self.blinks += 1
+                self.open_before = 0
+        elif self.open_run:
+            self.closed_run += 1
+
+    def _update_motion(self, face):
+        small = cv2.resize(face, (CROP_SIZE, CROP_SIZE),
+                           interpolation=cv2.INTER_AREA).astype(np.float32)
+        # Blur away sensor noise and sub-pixel resampling differences.
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        previous, self.previous = self.previous, small
+        if previous is None:
+            return
+        (dx, dy), _ = cv2.phaseCorrelate(previous, small)
+        shift = np.float32([[1, 0, -dx], [0, 1, -dy]])
+        aligned = cv2.warpAffine(small, shift, (CROP_SIZE, CROP_SIZE),
+                                 borderMode=cv2.BORDER_REPLICATE)
+        # Ignore the border, where the alignment shift replicates pixels.
+        m = CROP_SIZE // 8
+        self.motion.append(float(
+            np.mean(np.abs(aligned[m:-m, m:-m] - previous[m:-m, m:-m]))
+        ))
+
+    def update(self, face):
+        if self.verdict is not None:
+            return self.verdict
+
+        self.frames += 1
+        self._update_blink(face)
+        self._update_motion(face)
+        self.moire.append(moire_score(face))
+
+        if self.frames < self.min_frames:
+            return None
+        if np.median(self.moire) > self.moire_ratio:
+            self.verdict = False
+        elif self.blinks or np.median(self.motion) >= self.motion_threshold:
+            self.verdict = True
+        elif self.frames >= self.max_frames:
+            self.verdict = False
+        return self.verdict
+
+    def signals(self):
+        """Current evidence, for logs and the fixture benchmark."""
+        return {
+            "frames": self.frames,
+            "blinks": self.blinks,
+            "motion": float(np.median(self.motion)) if self.motion else 0.0,
+            "moire": float(np.median(self.moire)) if self.moire else 0.0,
+        }
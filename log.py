@@ -1,32 +1,250 @@
+import atexit
 import csv
 import os
-from datetime import datetime
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import ttk, messagebox
 
 class SimpleLogger:
-    def __init__(self, log_file="visitor_log.csv"):
+    """Access log stored in SQLite (WAL mode) next to the legacy CSV path.
+
+    Events are indexed by timestamp, name, action and event type so the
+    viewer can page through them newest-first without reading the whole
+    log. An existing visitor_log.csv is imported once on first use.
+
+    With async_writes=True, log_event only queues the event and a background
+    thread writes queued events in batches, so callers on the Tk thread never
+    wait on disk. Queued events are flushed by flush() and on close(), which
+    also runs at interpreter exit. fsync picks SQLite's synchronous mode:
+    "full" syncs every batch, "normal" syncs at WAL checkpoints, "off"
+    leaves it to the OS.
+
+    Events older than retention_days are deleted by compact(), which runs
+    once the log is opened and then every compact_interval seconds, on the
+    writer thread with async_writes (else with the first event logged). The delete walks the
+    timestamp index and frees pages incrementally, so its cost follows the
+    number of expired rows rather than the size of the log.
+    """
+
+    HEADER = ['Timestamp', 'Name', 'Action', 'Event Type']
+    SYNC_MODES = {"full": "FULL", "normal": "NORMAL", "off": "OFF"}
+
+    def __init__(self, log_file="visitor_log.csv", async_writes=False,
+                 batch_size=100, flush_interval=0.5, fsync="normal",
+                 retention_days=30, compact_interval=3600):
+        if fsync not in self.SYNC_MODES:
+            raise ValueError(f"fsync must be one of {sorted(self.SYNC_MODES)}")
         self.log_file = log_file
+        self.db_file = os.path.splitext(log_file)[0] + ".db"
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval
+        self.next_compact = 0.0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
         self.create_log_file()
-    
+
+        self.queue = None
+        self.writer = None
+        if async_writes:
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=self._write_batches, daemon=True)
+            self.writer.start()
+        atexit.register(self.close)
+
     def create_log_file(self):
-        """Create CSV file with headers if it doesn't exist"""
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Timestamp', 'Name', 'Action', 'Event Type'])
-    
+        """Create the event table and indexes, importing a legacy CSV once"""
+        with self.lock, self.conn:
+            # Only takes effect on a new database; lets compact() free pages.
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(f"PRAGMA synchronous={self.SYNC_MODES[self.fsync]}")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " id INTEGER PRIMARY KEY,"
+                " timestamp TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " action TEXT NOT NULL,"
+                " event_type TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS events_name ON events (name, id)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS events_type ON events (event_type, id)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS events_action ON events (action, id)")
+
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version == 0:
+                if os.path.exists(self.log_file):
+                    with open(self.log_file, 'r', newline='') as f:
+                        reader = csv.reader(f)
+                        next(reader, None)  # skip header
+                        self.conn.executemany(
+                            "INSERT INTO events (timestamp, name, action, event_type)"
+                            " VALUES (?, ?, ?, ?)",
+                            (row[:4] for row in reader if len(row) >= 4)
+                        )
+                self.conn.execute("PRAGMA user_version = 1")
+
     def log_event(self, name, action, event_type="FACE_DETECTED"):
-        """Log an event to CSV file"""
+        """Log an event to the access log"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        with open(self.log_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([timestamp, name, action, event_type])
-        
+        event = (timestamp, name, action, event_type)
+
+        if self.queue is not None:
+            self.queue.put(event)
+        else:
+            self._insert([event])
+            self._maybe_compact()
+
         return timestamp
 
+    def _insert(self, events):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO events (timestamp, name, action, event_type)"
+                " VALUES (?, ?, ?, ?)",
+                events
+            )
+
+    def _write_batches(self):
+        # The first compaction may delete a large backlog; keep it here,
+        # off the thread that opened the log.
+        self._maybe_compact()
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_compact()
+                continue
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            events = [event for event in batch if event is not None]
+            try:
+                if events:
+                    self._insert(events)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+            self._maybe_compact()
+
+    def flush(self):
+        """Block until every queued event has been written"""
+        if self.queue is not None:
+            self.queue.join()
+
+    def compact(self):
+        """Delete events older than the retention period"""
+        self.next_compact = time.monotonic() + self.compact_interval
+        if not self.retention_days:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)
+                  ).strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            with self.conn:
+                dropped = self.conn.execute(
+                    "DELETE FROM events WHERE timestamp < ?", (cutoff,)).rowcount
+            if dropped:
+                self.conn.execute("PRAGMA incremental_vacuum")
+        return dropped
+
+    def _maybe_compact(self):
+        if time.monotonic() >= self.next_compact:
+            self.compact()
+
+    def _where(self, start=None, end=None, name=None, action=None,
+               event_type=None, before_id=None, after_id=None):
+        clauses, params = [], []
+        for clause, value in (("timestamp >= ?", start), ("timestamp <= ?", end),
+                              ("name = ?", name), ("action = ?", action),
+                              ("event_type = ?", event_type),
+                              ("id < ?", before_id), ("id > ?", after_id)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def query(self, limit=100, **filters):
+        """Return (id, timestamp, name, action, event_type) rows, newest first.
+
+        Filters: start/end timestamps ("YYYY-MM-DD HH:MM:SS"), name, action,
+        event_type, and before_id/after_id for keyset pagination.
+        """
+        where, params = self._where(**filters)
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, timestamp, name, action, event_type FROM events"
+                + where + " ORDER BY id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM events" + where, params).fetchone()[0]
+
+    def export_csv(self, path, **filters):
+        """Stream matching events to a CSV file, oldest first"""
+        where, params = self._where(**filters)
+        exported = 0
+        with self.lock, open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.HEADER)
+            cursor = self.conn.execute(
+                "SELECT timestamp, name, action, event_type FROM events"
+                + where + " ORDER BY id", params)
+            for row in cursor:
+                writer.writerow(row)
+                exported += 1
+        return exported
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM events")
+
+    def close(self):
+        """Flush queued events and close the database"""
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+            self.queue = None
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
 class LogViewerWindow:
+    """Paged view of the access log.
+
+    Only one page of rows is loaded up front; older pages are fetched as the
+    list is scrolled towards the bottom, Refresh only pulls events newer
+    than the top row, and the filters are applied in the logger query.
+    """
+
+    PAGE_SIZE = 200
+    EVENT_TYPES = ("All", "FACE_DETECTED", "STRANGER_ALERT")
+
     def __init__(self, parent, logger):
         self.logger = logger
         self.window = tk.Toplevel(parent)
@@ -34,6 +252,10 @@ class LogViewerWindow:
         self.window.geometry("700x400")
         
         self.window.configure(bg='#2c3e50')
+        self.newest_id = None   # id of the top row in the tree
+        self.oldest_id = None   # id of the bottom row in the tree
+        self.exhausted = False  # no older rows left for the current filters
+        self.shown = 0
         self.setup_ui()
         self.load_logs()
     
@@ -43,6 +265,29 @@ class LogViewerWindow:
                         bg='#2c3e50', fg='white')
         title.pack(pady=10)
         
+        filter_frame = tk.Frame(self.window, bg='#2c3e50')
+        filter_frame.pack(fill=tk.X, padx=10)
+        
+        tk.Label(filter_frame, text="Name", bg='#2c3e50', fg='white').pack(side=tk.LEFT)
+        self.name_filter = tk.Entry(filter_frame, width=14)
+        self.name_filter.pack(side=tk.LEFT, padx=5)
+        
+        tk.Label(filter_frame, text="Action", bg='#2c3e50', fg='white').pack(side=tk.LEFT)
+        self.action_filter = tk.Entry(filter_frame, width=14)
+        self.action_filter.pack(side=tk.LEFT, padx=5)
+        
+        tk.Label(filter_frame, text="Event", bg='#2c3e50', fg='white').pack(side=tk.LEFT)
+        self.event_filter = ttk.Combobox(filter_frame, values=self.EVENT_TYPES,
+                                         state='readonly', width=16)
+        self.event_filter.current(0)
+        self.event_filter.pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(filter_frame, text="Apply", command=self.load_logs,
+                  font=("Arial", 10)).pack(side=tk.LEFT, padx=5)
+        for entry in (self.name_filter, self.action_filter):
+            entry.bind("<Return>", lambda _evt: self.load_logs())
+        self.event_filter.bind("<<ComboboxSelected>>", lambda _evt: self.load_logs())
+        
         frame = tk.Frame(self.window, bg='#2c3e50')
         frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
@@ -58,9 +303,12 @@ class LogViewerWindow:
         self.tree.column('Name', width=150)
         self.tree.column('Action', width=120)
         self.tree.column('Event', width=120)
+        self.tree.tag_configure('stranger', background='#ffcccc')
+        self.tree.tag_configure('unlock', background='#ccffcc')
         
         scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = scrollbar
+        self.tree.configure(yscrollcommand=self.on_scroll)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -69,7 +317,7 @@ class LogViewerWindow:
         button_frame.pack(fill=tk.X, padx=10, pady=10)
         
         refresh_btn = tk.Button(button_frame, text="🔄 Refresh", 
-                        command=self.load_logs,
+                        command=self.load_new_logs,
                         bg='#3498db', fg='white',
                             font=("Arial", 10))
         refresh_btn.pack(side=tk.LEFT, padx=5)
@@ -90,39 +338,90 @@ class LogViewerWindow:
                                 bg='#2c3e50', fg='#ecf0f1')
         self.status_label.pack(side=tk.RIGHT, padx=5)
     
+    def filters(self):
+        name = self.name_filter.get().strip()
+        action = self.action_filter.get().strip()
+        event_type = self.event_filter.get()
+        return {
+            'name': name or None,
+            'action': action or None,
+            'event_type': None if event_type == "All" else event_type,
+        }
+    
+    def insert_rows(self, rows, index=tk.END):
+        for offset, row in enumerate(rows):
+            tags = ()
+            if row[4] == "STRANGER_ALERT":
+                tags = ('stranger',)
+            elif row[3] == "UNLOCK":
+                tags = ('unlock',)
+            position = index + offset if index != tk.END else tk.END
+            self.tree.insert('', position, values=row[1:], tags=tags)
+        self.shown += len(rows)
+    
+    def update_status(self):
+        more = "" if self.exhausted else " (scroll for more)"
+        self.status_label.config(text=f"✅ Showing {self.shown} entries{more}")
+    
     def load_logs(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """Reset the view and load the newest page for the current filters"""
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.shown = 0
+        self.newest_id = self.oldest_id = None
+        self.exhausted = False
+        self.load_older_logs()
+    
+    def load_older_logs(self):
+        if self.exhausted:
+            return
+        try:
+            rows = self.logger.query(limit=self.PAGE_SIZE, before_id=self.oldest_id,
+                                     **self.filters())
+        except Exception as e:
+            self.status_label.config(text=f"❌ Error: {str(e)}")
+            return
         
+        if rows:
+            if self.newest_id is None:
+                self.newest_id = rows[0][0]
+            self.oldest_id = rows[-1][0]
+            self.insert_rows(rows)
+        self.exhausted = len(rows) < self.PAGE_SIZE
+        self.update_status()
+    
+    def load_new_logs(self):
+        """Prepend only the events logged since the top row was loaded"""
+        if self.newest_id is None:
+            self.load_logs()
+            return
         try:
-            with open(self.logger.log_file, 'r') as f:
-                reader = csv.reader(f)
-                next(reader)  # skip header
-                rows = list(reader)
-                for row in reversed(rows):
-                    if row and len(row) >= 4:
-                        tags = ()
-                        if row[3] == "STRANGER_ALERT":
-                            tags = ('stranger',)
-                        elif row[2] == "UNLOCK":
-                            tags = ('unlock',)
-                        self.tree.insert('', tk.END, values=row, tags=tags)
-            
-            self.tree.tag_configure('stranger', background='#ffcccc')
-            self.tree.tag_configure('unlock', background='#ccffcc')
-            
-            self.status_label.config(text=f"✅ Loaded {len(rows)} entries")
-        except FileNotFoundError:
-            self.status_label.config(text="📂 No log file yet")
+            rows = self.logger.query(limit=self.PAGE_SIZE, after_id=self.newest_id,
+                                     **self.filters())
         except Exception as e:
             self.status_label.config(text=f"❌ Error: {str(e)}")
+            return
+        
+        if len(rows) == self.PAGE_SIZE:
+            # Too many new rows to splice in without a gap; start over.
+            self.load_logs()
+            return
+        if rows:
+            self.newest_id = rows[0][0]
+            self.insert_rows(rows, index=0)
+        self.update_status()
+    
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) > 0.9 and not self.exhausted and self.oldest_id is not None:
+            self.load_older_logs()
     
     def export_logs(self):
         try:
-            import shutil
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             export_name = f"visitor_log_backup_{timestamp}.csv"
-            shutil.copy2(self.logger.log_file, export_name)
+            self.logger.export_csv(export_name)
             self.status_label.config(text=f"✅ Exported to {export_name}")
             messagebox.showinfo("Success", f"Logs exported to {export_name}")
         except Exception as e:
@@ -131,9 +430,7 @@ class LogViewerWindow:
     def clear_logs(self):
         if messagebox.askyesno("Confirm", "Delete all logs? This cannot be undone."):
             try:
-                with open(self.logger.log_file, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['Timestamp', 'Name', 'Action', 'Event Type'])
+                self.logger.clear()
                 self.load_logs()
                 self.status_label.config(text="✅ Log cleared")
             except Exception as e:
@@ -0,0 +1,222 @@
+"""Per-stage timers and counters for the vision loop.
+
+Use the shared `metrics` instance:
+
+    with metrics.stage("detect"):
+        faces = detector.detect(gray)
+    metrics.count("faces_detected", len(faces))
+
+While metrics.enabled is False, stage() hands back one shared no-op
+context manager and count() returns immediately, so instrumented code costs
+one attribute check. When enabled, each stage keeps its last `window`
+durations for p50/p95/p99, and snapshots can be written as Prometheus text
+or appended as JSON lines.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("samples", "start")
+
+    def __init__(self, samples):
+        self.samples = samples
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append(time.perf_counter() - self.start)
+        return False
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class Metrics:
+    def __init__(self, enabled=False, window=1024):
+        self.enabled = enabled
+        self.window = window
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.frame_times = deque(maxlen=30)
+        self.collectors = []
+        self.exporter = None
+
+    def _samples(self, name):
+        samples = self.stages.get(name)
+        if samples is None:
+            samples = self.stages.setdefault(name, deque(maxlen=self.window))
+        return samples
+
+    def stage(self, name):
+        """Context manager timing one stage; free when disabled."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self._samples(name))
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self._samples(name).append(seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def drain(self):
+        """Take the samples and counts recorded since the last drain.
+
+        For worker processes, whose metrics the parent merge()s into its
+        own; None while disabled.
+        """
+        if not self.enabled:
+            return None
+        report = {"stages": {name: list(samples)
+                             for name, samples in self.stages.items() if samples},
+                  "counters": dict(self.counters)}
+        for samples in self.stages.values():
+            samples.clear()
+        self.counters.clear()
+        return report
+
+    def merge(self, report):
+        """Add a drain() report from another process."""
+        if not self.enabled or not report:
+            return
+        for name, samples in report["stages"].items():
+            self._samples(name).extend(samples)
+        for name, n in report["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def collect(self, fn):
+        """Register fn() -> {name: total}, read as counters at snapshot time.
+
+        For totals another component already keeps (such as the frame
+        grabber's dropped-frame count), so the hot path does no extra work.
+        """
+        self.collectors.append(fn)
+
+    def mark_frame(self):
+        """Count a processed frame and remember when, for the FPS figure."""
+        if self.enabled:
+            self.counters["frames"] = self.counters.get("frames", 0) + 1
+            self.frame_times.append(time.perf_counter())
+
+    def fps(self):
+        times = list(self.frame_times)
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def snapshot(self):
+        stages = {}
+        for name, samples in list(self.stages.items()):
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            stages[name] = {
+                "count": len(ordered),
+                "p50_ms": _percentile(ordered, 0.50) * 1000.0,
+                "p95_ms": _percentile(ordered, 0.95) * 1000.0,
+                "p99_ms": _percentile(ordered, 0.99) * 1000.0,
+            }
+        counters = dict(self.counters)
+        for fn in self.collectors:
+            counters.update(fn())
+        return {
+            "time": time.time(),
+            "fps": self.fps(),
+            "counters": counters,
+            "gauges": dict(self.gauges),
+            "stages": stages,
+        }
+
+    def prometheus_text(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        lines = [
+            "# TYPE facecam_fps gauge",
+            f"facecam_fps {snapshot['fps']:.3f}",
+        ]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE facecam_{name}_total counter")
+            lines.append(f"facecam_{name}_total {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE facecam_{name} gauge")
+            lines.append(f"facecam_{name} {value}")
+        if snapshot["stages"]:
+            lines.append("# TYPE facecam_stage_seconds summary")
+        for name, stats in sorted(snapshot["stages"].items()):
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"),
+                                  ("0.99", "p99_ms")):
+                lines.append(
+                    f'facecam_stage_seconds{{stage="{name}",quantile="{quantile}"}} '
+                    f"{stats[key] / 1000.0:.9g}"
+                )
+            lines.append(f'facecam_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write a Prometheus text file (.prom) or append a JSON line (.jsonl)."""
+        snapshot = self.snapshot()
+        if path.endswith(".jsonl"):
+            with open(path, "a") as f:
+                f.write(json.dumps(snapshot) + "\n")
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text(snapshot))
+        os.replace(tmp_path, path)
+
+    def start_exporter(self, path, interval=10.0):
+        """Export to path every interval seconds on a daemon thread."""
+        if self.exporter is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                if self.enabled:
+                    self.export(path)
+
+        self.exporter = threading.Thread(target=run, daemon=True)
+        self.exporter.start()
+
+    def draw_overlay(self, frame, stages=("detect", "predict")):
+        """Draw FPS and p50 stage latencies in the frame's bottom-left corner."""
+        if not self.enabled:
+            return frame
+        import cv2
+
+        parts = [f"{self.fps():.1f} fps"]
+        for name in stages:
+            samples = self.stages.get(name)
+            if samples:
+                ordered = sorted(samples)
+                parts.append(f"{name} {_percentile(ordered, 0.5) * 1000.0:.1f}ms")
+        cv2.putText(frame, " | ".join(parts), (20, frame.shape[0] - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        return frame
+
+
+metrics = Metrics()
@@ -0,0 +1,35 @@
+"""Rebuild the roster index from the faces/ tree.
+
+Run with `python migrate_roster.py` once after upgrading, after copying
+or restoring faces/ by hand, or if a crash interrupted an enrollment. The
+whole index is replaced in one transaction, so an interrupted run leaves
+the previous index in place.
+"""
+import argparse
+
+import face_system
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset-dir", default=face_system.DATASET_DIR,
+                        help="faces directory to index (default: %(default)s)")
+    args = parser.parse_args()
+
+    face_system.DATASET_DIR = args.dataset_dir
+    roster = face_system.roster()
+    accounts, people = roster.rebuild()
+    for account in sorted(roster.accounts):
+        owner = roster.person(account)
+        members = roster.members(account)
+        print(f"{account:<20} {'sample' if owner['sample'] else 'no sample':<10} "
+              f"{len(members)} member(s)")
+        for member in members:
+            person = roster.person(account, member)
+            print(f"    {member:<16} {person['role']:<8} "
+                  f"{'sample' if person['sample'] else 'no sample'}")
+    print(f"Indexed {accounts} account(s), {people} people in {roster.db_file}")
+
+
+if __name__ == "__main__":
+    main()
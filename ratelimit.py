@@ -0,0 +1,117 @@
+"""Failed-attempt tracking with lockouts that grow on repeated failures.
+
+Each key (a user for logins and scans, a camera for scans) keeps only its
+last max_failures failure times, so checking and recording are constant
+time however many attempts are made. max_failures failures within
+`window` seconds lock the key for `backoff` seconds; every further lockout
+doubles that, up to max_backoff. A success clears the key, and a key that
+has not failed for max_backoff seconds starts again from the first
+lockout. State is kept in a small JSON file, so restarting the program
+does not lift a lockout.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class AttemptLimiter:
+    def __init__(self, path=None, max_failures=3, window=60.0, backoff=60.0,
+                 max_backoff=3600.0):
+        self.path = path
+        self.max_failures = max_failures
+        self.window = window
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.state = None       # key -> {"failures": deque, "last", "strikes", "until"}
+
+    def _load(self):
+        if self.state is not None:
+            return
+        self.state = {}
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            for key, entry in saved.items():
+                self.state[key] = {
+                    "failures": deque(entry["failures"], maxlen=self.max_failures),
+                    "last": float(entry["last"]),
+                    "strikes": int(entry["strikes"]),
+                    "until": float(entry["until"]),
+                }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # A lost or damaged file only forgets past failures.
+            pass
+
+    def _expired(self, entry, now):
+        return (entry["until"] <= now
+                and now - entry["last"] > max(self.window, self.max_backoff))
+
+    def _save(self, now):
+        for key in [k for k, e in self.state.items() if self._expired(e, now)]:
+            del self.state[key]
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({key: {"failures": list(e["failures"]),
+                             "last": e["last"],
+                             "strikes": e["strikes"],
+                             "until": e["until"]}
+                       for key, e in self.state.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def retry_after(self, *keys):
+        """Seconds until every key may try again; 0 if none is locked out."""
+        now = time.time()
+        with self.lock:
+            self._load()
+            waits = [self.state[key]["until"] - now for key in keys if key in self.state]
+        return max([0.0] + waits)
+
+    def record(self, success, *keys):
+        """Record one attempt's outcome for keys; returns retry_after(*keys)."""
+        now = time.time()
+        with self.lock:
+            self._load()
+            changed = False
+            for key in keys:
+                entry = self.state.get(key)
+                if success:
+                    if entry is not None:
+                        del self.state[key]
+                        changed = True
+                    continue
+
+                if entry is None or self._expired(entry, now):
+                    entry = self.state[key] = {
+                        "failures": deque(maxlen=self.max_failures),
+                        "last": now,
+                        "strikes": 0,
+                        "until": 0.0,
+                    }
+                failures = entry["failures"]
+                failures.append(now)
+                entry["last"] = now
+                if (len(failures) == self.max_failures
+                        and now - failures[0] <= self.window):
+                    lockout = self.backoff * 2 ** min(entry["strikes"], 32)
+                    entry["until"] = now + min(self.max_backoff, lockout)
+                    entry["strikes"] += 1
+                    failures.clear()
+                changed = True
+            if changed:
+                self._save(now)
+        return self.retry_after(*keys)
+
+    def reset(self, *keys):
+        """Forget keys (all of them when none are given)."""
+        with self.lock:
+            self._load()
+            for key in keys or list(self.state):
+                self.state.pop(key, None)
+            self._save(time.time())
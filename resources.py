@@ -0,0 +1,28 @@
+import threading
+
+
+class LazyResource:
+    """A value built by factory() on first get(), once, from any thread."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.value = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.value is not None
+
+    def get(self):
+        value = self.value
+        if value is None:
+            with self.lock:
+                if self.value is None:
+                    self.value = self.factory()
+                value = self.value
+        return value
+
+    def reset(self):
+        """Drop the value so the next get() builds it again."""
+        with self.lock:
+            self.value = None
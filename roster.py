@@ -0,0 +1,283 @@
+"""Index of accounts, members, roles, names and face-sample pointers.
+
+The faces/ tree stays the source of truth: each account directory holds
+password.txt and info.txt, members live under members/<name>/, and every
+person has one face sample file. Walking that tree and opening its tiny
+files on every login or retrain is slow on SD-card storage, so Roster
+keeps the same facts in one SQLite database (ROSTER_DB in the dataset
+directory) that is read into dicts once and then answers every lookup
+from memory.
+
+Mutations write the tree first and commit the index in one transaction
+afterwards (deletions go the other way round), so after a crash the index
+never points at something the tree lacks. `python migrate_roster.py`
+rebuilds the index from the tree; a missing index is rebuilt on first use.
+"""
+import os
+import sqlite3
+import threading
+
+ROSTER_DB = "roster.db"
+SCHEMA_VERSION = 1
+ROLES = ("owner", "member", "guest")
+PASSWORD_FILE = "password.txt"
+INFO_FILE = "info.txt"
+ROLE_FILE = "role.txt"      # only written for members whose role is not "member"
+MEMBERS_DIR = "members"
+
+
+def write_text(path, text):
+    """Replace a small file atomically, so a crash leaves old or new, not half."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_text(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class Roster:
+    """In-memory roster for one dataset directory, backed by ROSTER_DB.
+
+    People are keyed by (account, member); the account owner has member
+    None. sample_names lists the sample file names a person directory may
+    hold, preferred first.
+    """
+
+    def __init__(self, dataset_dir, sample_names):
+        self.dataset_dir = dataset_dir
+        self.db_file = os.path.join(dataset_dir, ROSTER_DB)
+        self.sample_names = tuple(sample_names)
+        self.lock = threading.RLock()
+        self.conn = None
+        self.loaded = False
+        self.accounts = {}      # username -> {"password_hash", "full_name"}
+        self.people = {}        # (account, member or None) -> {"role", "sample"}
+
+    # ------------------ loading ------------------
+    def _connect(self):
+        if self.conn is not None:
+            return False
+        os.makedirs(self.dataset_dir, exist_ok=True)
+        exists = os.path.exists(self.db_file)
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if exists and version == SCHEMA_VERSION:
+            self._load()
+            return False
+
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS accounts")
+            self.conn.execute("DROP TABLE IF EXISTS people")
+            self.conn.execute(
+                "CREATE TABLE accounts (username TEXT PRIMARY KEY, "
+                "password_hash TEXT, full_name TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE people (account TEXT NOT NULL, member TEXT NOT NULL, "
+                "role TEXT NOT NULL, sample TEXT, PRIMARY KEY (account, member))"
+            )
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        return True
+
+    def _load(self):
+        self.accounts = {
+            username: {"password_hash": password_hash, "full_name": full_name}
+            for username, password_hash, full_name in self.conn.execute(
+                "SELECT username, password_hash, full_name FROM accounts"
+            )
+        }
+        self.people = {
+            (account, member or None): {"role": role, "sample": sample}
+            for account, member, role, sample in self.conn.execute(
+                "SELECT account, member, role, sample FROM people"
+            )
+        }
+
+    def _ready(self):
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    if self._connect():
+                        self.rebuild()
+                    self.loaded = True
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+                self.loaded = False
+
+    # ------------------ paths ------------------
+    def person_dir(self, account, member=None):
+        account_dir = os.path.join(self.dataset_dir, account)
+        if member is None:
+            return account_dir
+        return os.path.join(account_dir, MEMBERS_DIR, member)
+
+    def _find_sample(self, face_dir):
+        for name in self.sample_names:
+            if os.path.isfile(os.path.join(face_dir, name)):
+                return name
+        return None
+
+    # ------------------ lookups (memory only) ------------------
+    def account(self, username):
+        """{"password_hash", "full_name"} for an account, or None."""
+        self._ready()
+        return self.accounts.get(username)
+
+    def person(self, account, member=None):
+        """{"role", "sample"} for the owner (member None) or a member, or None."""
+        self._ready()
+        return self.people.get((account, member))
+
+    def members(self, account):
+        self._ready()
+        return sorted(m for a, m in self.people if a == account and m is not None)
+
+    def samples(self):
+        """[(sample path, account)] for every person with a sample, in a
+        stable order: accounts by name, each owner before their members."""
+        self._ready()
+        keyed = sorted(self.people.items(),
+                       key=lambda item: (item[0][0], item[0][1] is not None,
+                                         item[0][1] or ""))
+        return [(os.path.join(self.person_dir(account, member), info["sample"]),
+                 account)
+                for (account, member), info in keyed if info["sample"]]
+
+    # ------------------ mutations ------------------
+    def put_account(self, username, password_hash, full_name):
+        """Create or overwrite an account's credentials and display name."""
+        self._ready()
+        with self.lock:
+            user_dir = self.person_dir(username)
+            os.makedirs(user_dir, exist_ok=True)
+            write_text(os.path.join(user_dir, PASSWORD_FILE), password_hash)
+            write_text(os.path.join(user_dir, INFO_FILE), full_name)
+
+            owner = self.people.get((username, None), {"sample": None})
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO accounts VALUES (?, ?, ?)",
+                    (username, password_hash, full_name),
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO people VALUES (?, '', 'owner', ?)",
+                    (username, owner["sample"]),
+                )
+            self.accounts[username] = {"password_hash": password_hash,
+                                       "full_name": full_name}
+            self.people[(username, None)] = {"role": "owner",
+                                             "sample": owner["sample"]}
+
+    def set_password_hash(self, username, password_hash):
+        """Replace an existing account's stored credential."""
+        self._ready()
+        with self.lock:
+            info = self.accounts[username]
+            write_text(os.path.join(self.person_dir(username), PASSWORD_FILE),
+                       password_hash)
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE accounts SET password_hash = ? WHERE username = ?",
+                    (password_hash, username),
+                )
+            info["password_hash"] = password_hash
+
+    def put_person(self, account, member=None, role=None, sample=None):
+        """Record a person whose directory (and sample, if any) is on disk.
+
+        role defaults to "owner" for the account owner and "member" for
+        everyone else.
+        """
+        self._ready()
+        role = role or ("owner" if member is None else "member")
+        if role not in ROLES:
+            raise ValueError(f"role must be one of {ROLES}")
+        with self.lock:
+            if member is not None:
+                role_path = os.path.join(self.person_dir(account, member), ROLE_FILE)
+                if role != "member":
+                    write_text(role_path, role)
+                elif os.path.exists(role_path):
+                    os.remove(role_path)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO people VALUES (?, ?, ?, ?)",
+                    (account, member or "", role, sample),
+                )
+            self.people[(account, member)] = {"role": role, "sample": sample}
+
+    def set_sample(self, account, member=None, sample=None):
+        """Point a person at their sample file name (None: no sample)."""
+        person = self.person(account, member)
+        self.put_person(account, member, person["role"] if person else None, sample)
+
+    def remove_account(self, username):
+        """Drop an account and its members from the index (not the tree)."""
+        self._ready()
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM accounts WHERE username = ?", (username,))
+                self.conn.execute("DELETE FROM people WHERE account = ?", (username,))
+            self.accounts.pop(username, None)
+            for key in [key for key in self.people if key[0] == username]:
+                del self.people[key]
+
+    def rebuild(self):
+        """Re-read the whole faces/ tree into the index in one transaction."""
+        with self.lock:
+            self._connect()
+            accounts, people = {}, {}
+            for username in sorted(os.listdir(self.dataset_dir)):
+                user_dir = self.person_dir(username)
+                if not os.path.isdir(user_dir):
+                    continue
+                password_hash = _read_text(os.path.join(user_dir, PASSWORD_FILE))
+                full_name = _read_text(os.path.join(user_dir, INFO_FILE))
+                accounts[username] = {
+                    "password_hash": password_hash.strip() if password_hash else None,
+                    "full_name": full_name,
+                }
+                people[(username, None)] = {"role": "owner",
+                                            "sample": self._find_sample(user_dir)}
+
+                members_dir = os.path.join(user_dir, MEMBERS_DIR)
+                if not os.path.isdir(members_dir):
+                    continue
+                for member in sorted(os.listdir(members_dir)):
+                    member_dir = os.path.join(members_dir, member)
+                    if not os.path.isdir(member_dir):
+                        continue
+                    role = (_read_text(os.path.join(member_dir, ROLE_FILE)) or "").strip()
+                    people[(username, member)] = {
+                        "role": role if role in ROLES else "member",
+                        "sample": self._find_sample(member_dir),
+                    }
+
+            with self.conn:
+                self.conn.execute("DELETE FROM accounts")
+                self.conn.execute("DELETE FROM people")
+                self.conn.executemany(
+                    "INSERT INTO accounts VALUES (?, ?, ?)",
+                    [(u, a["password_hash"], a["full_name"]) for u, a in accounts.items()],
+                )
+                self.conn.executemany(
+                    "INSERT INTO people VALUES (?, ?, ?, ?)",
+                    [(a, m or "", p["role"], p["sample"]) for (a, m), p in people.items()],
+                )
+            self.accounts, self.people = accounts, people
+            return len(accounts), len(people)
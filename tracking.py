@@ -0,0 +1,149 @@
+import cv2
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class Track:
+    def __init__(self, box, template, scale, landmarks=None):
+        self.box = tuple(int(v) for v in box)
+        self.landmarks = landmarks  # detector landmarks row, moved with the box
+        self.template = template    # downscaled crop taken at detection time
+        self.scale = scale          # template size / full-resolution size
+        self.score = 1.0            # template-match confidence of last update
+        self.prediction = None      # cached (label, confidence)
+        self.predicted_box = None   # box the cached prediction was made on
+        self.predicted_at = None    # tracker frame the prediction was made on
+
+
+class FaceTracker:
+    """Detect faces every few frames and follow them with template matching.
+
+    detect is any callable taking a gray frame and the previous boxes and
+    returning (x, y, w, h) boxes. Between detections each box is searched
+    for in a padded window around its last position on a downscaled copy,
+    which is far cheaper than a full cascade pass. Predictions are cached per track and only redone
+    once the box has moved enough, or, with repredict_every set, once the
+    cached one is that many frames old.
+    """
+
+    def __init__(self, detect, detect_every=5, min_score=0.6,
+                 search_margin=0.5, template_width=48, repredict_iou=0.5,
+                 repredict_every=None):
+        self.detect = detect
+        self.detect_every = max(1, detect_every)
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.template_width = template_width
+        self.repredict_iou = repredict_iou
+        self.repredict_every = repredict_every
+        self.tracks = []
+        self.frame = 0
+        self.frames_since_detect = 0
+        self.detections = 0
+        self.predictions = 0
+
+    def _make_track(self, gray, box, landmarks=None):
+        x, y, w, h = box
+        scale = min(1.0, self.template_width / float(w))
+        crop = gray[y:y+h, x:x+w]
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        return Track(box, cv2.resize(crop, size), scale, landmarks)
+
+    def _redetect(self, gray):
+        self.detections += 1
+        self.frames_since_detect = 0
+        tracks = []
+        for box in self.detect(gray, [t.box for t in self.tracks]):
+            track = self._make_track(gray, tuple(int(v) for v in box),
+                                     getattr(box, "landmarks", None))
+            best = max(self.tracks, key=lambda t: box_iou(t.box, track.box),
+                       default=None)
+            if best is not None and box_iou(best.box, track.box) >= self.repredict_iou:
+                track.prediction = best.prediction
+                track.predicted_box = best.predicted_box
+                track.predicted_at = best.predicted_at
+            tracks.append(track)
+        self.tracks = tracks
+
+    def _follow(self, gray, track):
+        x, y, w, h = track.box
+        frame_h, frame_w = gray.shape[:2]
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+
+        th, tw = track.template.shape[:2]
+        region = cv2.resize(
+            gray[y0:y1, x0:x1],
+            (max(tw, round((x1 - x0) * track.scale)),
+             max(th, round((y1 - y0) * track.scale))),
+        )
+        result = cv2.matchTemplate(region, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(result)
+
+        track.score = score
+        track.box = (x0 + int(loc[0] / track.scale),
+                     y0 + int(loc[1] / track.scale), w, h)
+        if track.landmarks is not None:
+            # Boxes only translate between detections; so do the landmarks.
+            dx, dy = track.box[0] - x, track.box[1] - y
+            landmarks = track.landmarks.copy()
+            landmarks[0] += dx          # box corner (w and h stay)
+            landmarks[1] += dy
+            landmarks[4:14:2] += dx     # the five points
+            landmarks[5:14:2] += dy
+            track.landmarks = landmarks
+        return score >= self.min_score
+
+    def update(self, gray):
+        """Advance one frame and return the current list of tracks."""
+        self.frame += 1
+        self.frames_since_detect += 1
+        if not self.tracks or self.frames_since_detect >= self.detect_every:
+            self._redetect(gray)
+            return self.tracks
+
+        if not all(self._follow(gray, track) for track in self.tracks):
+            # Tracking confidence dropped; fall back to a full detection.
+            self._redetect(gray)
+        return self.tracks
+
+    def _needs_prediction(self, track):
+        return (track.prediction is None
+                or box_iou(track.box, track.predicted_box) < self.repredict_iou
+                or (self.repredict_every is not None
+                    and self.frame - track.predicted_at >= self.repredict_every))
+
+    def is_fresh(self, track):
+        """Whether the track's prediction was made on the current frame."""
+        return track.predicted_at == self.frame
+
+    def predict_all(self, gray, predict_batch, crop=None):
+        """Return every track's prediction, scoring stale ones in one call.
+
+        crop(track) gives the recognizer's input for a track; by default it
+        is the track's gray crop.
+        """
+        stale = [track for track in self.tracks if self._needs_prediction(track)]
+        if stale:
+            crops = []
+            for track in stale:
+                if crop is not None:
+                    crops.append(crop(track))
+                else:
+                    x, y, w, h = track.box
+                    crops.append(gray[y:y+h, x:x+w])
+            for track, prediction in zip(stale, predict_batch(crops)):
+                track.prediction = prediction
+                track.predicted_box = track.box
+                track.predicted_at = self.frame
+            self.predictions += len(stale)
+        return [track.prediction for track in self.tracks]